@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import openpyxl
+
+from build_output import ensure_metric_headers
+
+TEMPLATE_HEADER = ("کد محصول", "نام طرح", "سایز محصول", "مقدار تقسیم پالت")
+NAME_WORDS = ("دکور", "رها", "کرم", "طوسی", "سفید", "مات", "براق", "سنگ", "چوب", "بژ")
+SIZES = ("30*60", "60*60", "60*120", "80*80", "30*90")
+
+
+def generate_template(path: Path, rows: int, rng: random.Random) -> None:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(TEMPLATE_HEADER)
+    codes = rng.sample(range(1000, 1000 + rows * 10), rows)
+    for code in codes:
+        name = " ".join(rng.sample(NAME_WORDS, 3))
+        ws.append((code, name, rng.choice(SIZES), rng.choice((97.2, 86.4, 72, 60))))
+    wb.save(path)
+    wb.close()
+
+
+def generate_output(template_path: Path, output_path: Path, rng: random.Random) -> None:
+    wb = openpyxl.load_workbook(template_path)
+    ws = wb.active
+    ensure_metric_headers(ws, ["1", "2"])
+    for r in range(2, ws.max_row + 1):
+        for col in range(5, ws.max_column + 1):
+            if rng.random() < 0.6:
+                ws.cell(r, col).value = f"{rng.randint(1, 900)}.{rng.randint(0, 9)}"
+    wb.save(output_path)
+    wb.close()
+
+
+def fresh_copy(path: Path, index: int) -> Path:
+    copy_path = path.with_name(f"{path.stem}_{index}{path.suffix}")
+    shutil.copy(path, copy_path)
+    return copy_path
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "min_ms": round(ordered[0], 4),
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "max_ms": round(ordered[-1], 4),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+    }
+
+
+def time_call(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+
+def search_queries(rows: list[dict], rng: random.Random, count: int) -> list[str]:
+    queries = []
+    for _ in range(count):
+        row = rng.choice(rows)
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(row["code_display"])
+        elif kind == 1:
+            queries.append(row["name_display"][:3])
+        elif kind == 2:
+            queries.append(row["name_display"].split()[-1])
+        else:
+            queries.append("zzzz")
+    return queries
+
+
+def row_values(rng: random.Random, index: int) -> dict:
+    return {
+        "code": str(900000 + index),
+        "name": " ".join(rng.sample(NAME_WORDS, 3)),
+        "size": rng.choice(SIZES),
+        "divisor": Decimal("97.2"),
+    }
+
+
+class BackgroundWriter:
+    # Keeps the template write lock busy so reader timings include lock wait.
+
+    def __init__(self, storage, template_path: Path, rng: random.Random) -> None:
+        self._storage = storage
+        self._template_path = template_path
+        self._rng = rng
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.writes = 0
+
+    def _run(self) -> None:
+        index = 0
+        while not self._stop.is_set():
+            rows = self._storage.list_template_rows(self._template_path)
+            self._storage.update_template_row(
+                self._rng.choice(rows), row_values(self._rng, index), self._template_path
+            )
+            index += 1
+            self.writes += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def bench_size(storage, workdir: Path, size: int, args, rng: random.Random) -> list[dict]:
+    results: list[dict] = []
+
+    def record(operation: str, phase: str, samples: list[float]) -> None:
+        entry = {"rows": size, "operation": operation, "phase": phase, **summarize(samples)}
+        results.append(entry)
+        print(
+            f"{size:>6} {operation:<28} {phase:<12}"
+            f" median {entry['median_ms']:>9.3f} ms  p95 {entry['p95_ms']:>9.3f} ms"
+        )
+
+    template_path = workdir / f"template_{size}.xlsx"
+    output_path = workdir / f"output_{size}.xlsx"
+    generate_template(template_path, size, rng)
+    generate_output(template_path, output_path, rng)
+
+    cold_list, cold_search, cold_details = [], [], []
+    for index in range(args.cold_repeat):
+        copy_path = fresh_copy(template_path, index)
+        cold_list.append(time_call(storage.list_template_rows, copy_path))
+        cold_search.append(
+            time_call(storage.find_template_matches_any, "رها", copy_path, args.limit)
+        )
+        output_copy = fresh_copy(output_path, index)
+        target = storage.list_template_rows(copy_path)[0]
+        cold_details.append(time_call(storage.get_output_row_details, target, output_copy))
+    record("list_template_rows", "cold", cold_list)
+    record("find_template_matches_any", "cold", cold_search)
+    record("get_output_row_details", "cold", cold_details)
+
+    rows = storage.list_template_rows(template_path)
+    queries = search_queries(rows, rng, args.repeat)
+    targets = [rng.choice(rows) for _ in range(args.repeat)]
+    storage.find_template_matches_any("", template_path, args.limit)
+    storage.get_output_row_details(rows[0], output_path)
+
+    def warm_reads(phase: str) -> None:
+        record(
+            "list_template_rows",
+            phase,
+            [time_call(storage.list_template_rows, template_path) for _ in range(args.repeat)],
+        )
+        record(
+            "find_template_matches_any",
+            phase,
+            [
+                time_call(storage.find_template_matches_any, query, template_path, args.limit)
+                for query in queries
+            ],
+        )
+        record(
+            "get_output_row_details",
+            phase,
+            [
+                time_call(storage.get_output_row_details, target, output_path)
+                for target in targets
+            ],
+        )
+
+    warm_reads("warm")
+    if args.contention:
+        with BackgroundWriter(storage, template_path, random.Random(args.seed)) as writer:
+            warm_reads("contended")
+        print(f"{size:>6} background writes during contended reads: {writer.writes}")
+
+    writes = min(args.repeat, args.max_writes)
+    record(
+        "append_template_row",
+        "warm",
+        [
+            time_call(
+                storage.append_template_row,
+                *row_values(rng, index).values(),
+                template_path=template_path,
+            )
+            for index in range(writes)
+        ],
+    )
+    update_samples = []
+    for index in range(writes):
+        target = rng.choice(storage.list_template_rows(template_path))
+        update_samples.append(
+            time_call(
+                storage.update_template_row,
+                target,
+                row_values(rng, writes + index),
+                template_path,
+            )
+        )
+    record("update_template_row", "warm", update_samples)
+    delete_samples = []
+    for _ in range(writes):
+        target = rng.choice(storage.list_template_rows(template_path))
+        delete_samples.append(time_call(storage.delete_template_row, target, template_path))
+    record("delete_template_row", "warm", delete_samples)
+    record(
+        "export_template",
+        "after_writes",
+        [time_call(storage.export_template, template_path)],
+    )
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Time the bot storage layer against generated templates."
+    )
+    p.add_argument(
+        "--sizes",
+        default="100,1000,5000,20000",
+        help="Comma-separated template row counts.",
+    )
+    p.add_argument("--repeat", type=int, default=50, help="Samples per warm operation.")
+    p.add_argument(
+        "--cold-repeat",
+        type=int,
+        default=3,
+        help="Samples per cold operation (each on a fresh file copy).",
+    )
+    p.add_argument(
+        "--max-writes",
+        type=int,
+        default=20,
+        help="Cap on append/update/delete samples per size.",
+    )
+    p.add_argument("--limit", type=int, default=50, help="Search result limit.")
+    p.add_argument(
+        "--backend",
+        choices=["xlsx", "sqlite"],
+        default=None,
+        help="Template backend (default: BOT_TEMPLATE_BACKEND).",
+    )
+    p.add_argument(
+        "--journal",
+        choices=["0", "1"],
+        default=None,
+        help="Template journal for the xlsx backend (default: BOT_TEMPLATE_JOURNAL).",
+    )
+    p.add_argument(
+        "--contention",
+        action="store_true",
+        help="Also time reads while a background thread keeps editing the template.",
+    )
+    p.add_argument("--seed", type=int, default=1, help="Random seed.")
+    p.add_argument(
+        "--output",
+        default="bench_output.json",
+        help="Path for the JSON results.",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.backend:
+        os.environ["BOT_TEMPLATE_BACKEND"] = args.backend
+    if args.journal:
+        os.environ["BOT_TEMPLATE_JOURNAL"] = args.journal
+    from bot import config, storage
+
+    rng = random.Random(args.seed)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="bench_storage_") as tmpdir:
+        for size in sizes:
+            results.extend(bench_size(storage, Path(tmpdir), size, args, rng))
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": config.TEMPLATE_BACKEND,
+            "journal": config.TEMPLATE_JOURNAL,
+            "sizes": sizes,
+            "repeat": args.repeat,
+            "cold_repeat": args.cold_repeat,
+            "max_writes": args.max_writes,
+            "limit": args.limit,
+            "contention": args.contention,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import hashlib
+from pathlib import Path
+
+from .config import MAX_QUEUED_UPLOADS, MAX_USER_UPLOADS, PROCESS_WORKERS
+
+# Uploads admitted and not yet finished, oldest first. Each one holds the
+# Telegram file id and, once downloaded, the content digest, so the same
+# file sent again while the first copy is still in flight can be dropped.
+_JOBS: list[dict] = []
+
+
+def admit_upload(user_id: int, scope, file_id: str) -> tuple[dict | None, str | None]:
+    if any(job["scope"] == scope and file_id in job["keys"] for job in _JOBS):
+        return None, "همین فایل در صف پردازش است؛ نتیجه همان ارسال می‌شود."
+    if sum(job["user"] == user_id for job in _JOBS) >= MAX_USER_UPLOADS:
+        return None, (
+            f"حداکثر {MAX_USER_UPLOADS} فایل همزمان قابل پردازش است."
+            " بعد از پایان فایل‌های قبلی دوباره ارسال کنید."
+        )
+    if len(_JOBS) >= MAX_QUEUED_UPLOADS:
+        return None, "صف پردازش پر است. کمی بعد دوباره تلاش کنید."
+    job = {"user": user_id, "scope": scope, "keys": {file_id}}
+    _JOBS.append(job)
+    return job, None
+
+
+def claim_content(job: dict, digest: str) -> bool:
+    if any(
+        other is not job and other["scope"] == job["scope"] and digest in other["keys"]
+        for other in _JOBS
+    ):
+        return False
+    job["keys"].add(digest)
+    return True
+
+
+def release_upload(job: dict) -> None:
+    _JOBS[:] = [other for other in _JOBS if other is not job]
+
+
+def queue_position(job: dict) -> int:
+    # 0 when a worker is free for this job, otherwise how many jobs must
+    # finish first. Approximate: earlier uploads may still be downloading.
+    ahead = next(index for index, other in enumerate(_JOBS) if other is job)
+    return max(0, ahead - max(1, PROCESS_WORKERS) + 1)
+
+
+def file_digest(path: Path) -> str:
+    with path.open("rb") as handle:
+        return hashlib.file_digest(handle, "sha256").hexdigest()
+
+
+def data_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,66 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import admission, catalogs, config, pdf_utils, storage, template_import
+from .config import STORAGE_THREADS
+
+# Workbook loads, template writes, catalog file access and PDF rendering all
+# block. Handlers await these wrappers instead, so the blocking call runs on
+# a small dedicated pool and the event loop keeps serving other users. The
+# pool is separate from the default executor so slow exports cannot starve
+# the threads that wait on processing workers.
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(1, STORAGE_THREADS), thread_name_prefix="storage"
+)
+
+
+def _awaitable(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _EXECUTOR, functools.partial(func, *args, **kwargs)
+        )
+
+    return wrapper
+
+
+list_template_rows = _awaitable(storage.list_template_rows)
+find_template_matches_any = _awaitable(storage.find_template_matches_any)
+append_template_row = _awaitable(storage.append_template_row)
+update_template_row = _awaitable(storage.update_template_row)
+delete_template_row = _awaitable(storage.delete_template_row)
+apply_template_changes = _awaitable(storage.apply_template_changes)
+upsert_template_rows = _awaitable(storage.upsert_template_rows)
+export_template = _awaitable(storage.export_template)
+compact_template_journal = _awaitable(storage.compact_template_journal)
+get_output_row_details = _awaitable(storage.get_output_row_details)
+get_output_rows_details = _awaitable(storage.get_output_rows_details)
+
+list_catalog_images = _awaitable(catalogs.list_catalog_images)
+catalog_image_count = _awaitable(catalogs.catalog_image_count)
+add_catalog_image = _awaitable(catalogs.add_catalog_image)
+clear_catalog = _awaitable(catalogs.clear_catalog)
+catalog_file_ids = _awaitable(catalogs.catalog_file_ids)
+remember_catalog_file_ids = _awaitable(catalogs.remember_catalog_file_ids)
+forget_catalog_file_ids = _awaitable(catalogs.forget_catalog_file_ids)
+
+read_file_bytes = _awaitable(Path.read_bytes)
+render_pdf = _awaitable(pdf_utils.render_pdf)
+read_import_rows = _awaitable(template_import.read_import_rows)
+file_digest = _awaitable(admission.file_digest)
+data_digest = _awaitable(admission.data_digest)
+
+_copy_warehouse_template = _awaitable(config.ensure_warehouse_template_path)
+
+
+async def ensure_warehouse_template_path(key: str) -> Path | None:
+    # An existing copy is the common case and only needs a stat; the first
+    # copy from the source template takes the template lock, so it runs on
+    # the pool.
+    path = config.warehouse_template_path(key)
+    if path.exists():
+        return path
+    return await _copy_warehouse_template(key)
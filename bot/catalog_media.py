@@ -0,0 +1,58 @@
+import logging
+from pathlib import Path
+
+from telegram import InputMediaPhoto, Message
+from telegram.error import BadRequest
+
+from .async_storage import (
+    catalog_file_ids,
+    forget_catalog_file_ids,
+    read_file_bytes,
+    remember_catalog_file_ids,
+)
+
+
+async def _send_photos(
+    message: Message, images: list[Path], file_ids: dict[str, str], caption: str
+) -> list[str]:
+    sources = []
+    for path in images:
+        source = file_ids.get(path.name)
+        if source is None:
+            source = await read_file_bytes(path)
+        sources.append(source)
+    if len(sources) == 1:
+        sent = [await message.reply_photo(photo=sources[0], caption=caption or None)]
+    else:
+        media = [
+            InputMediaPhoto(source, caption=caption if index == 0 and caption else None)
+            for index, source in enumerate(sources)
+        ]
+        sent = list(await message.reply_media_group(media=media))
+    return [item.photo[-1].file_id for item in sent]
+
+
+async def send_catalog_photos(
+    message: Message,
+    warehouse_key: str,
+    row: dict,
+    images: list[Path],
+    caption: str = "",
+) -> None:
+    file_ids = await catalog_file_ids(warehouse_key, row)
+    try:
+        sent_ids = await _send_photos(message, images, file_ids, caption)
+    except BadRequest:
+        if not any(path.name in file_ids for path in images):
+            raise
+        logging.warning("Stale catalog file_ids for %s; uploading from disk.", row.get("row"))
+        await forget_catalog_file_ids(warehouse_key, row)
+        file_ids = {}
+        sent_ids = await _send_photos(message, images, file_ids, caption)
+    new_ids = {
+        path.name: file_id
+        for path, file_id in zip(images, sent_ids)
+        if file_ids.get(path.name) != file_id
+    }
+    if new_ids:
+        await remember_catalog_file_ids(warehouse_key, row, new_ids)
@@ -1,14 +1,22 @@
 import hashlib
+import json
+import os
 import re
 from pathlib import Path
 from shutil import rmtree
 
 from .config import DATA_DIR
+from .locks import bump_version, file_lock, read_version
 from .utils import clean_text, normalize_code_value, normalize_query
 
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 MAX_CATALOG_IMAGES = 10
+FILE_IDS_NAME = "file_ids.json"
 _SLUG_RE = re.compile(r"[^a-z0-9_-]+")
+# Image lists by catalog id, per warehouse, valid for one catalog version.
+# Every catalog write bumps the version, in this process or another, so a
+# stale list is dropped on the next read.
+_IMAGE_LISTS: dict[str, tuple[int, dict[str, list[Path]]]] = {}
 
 
 def _slugify(text: str) -> str:
@@ -43,8 +51,7 @@ def catalog_dir_path(warehouse_key: str, row: dict) -> Path:
     return catalog_root(warehouse_key) / catalog_id_for_row(row)
 
 
-def list_catalog_images(warehouse_key: str, row: dict) -> list[Path]:
-    catalog_dir = catalog_dir_path(warehouse_key, row)
+def _scan_catalog_images(catalog_dir: Path) -> list[Path]:
     if not catalog_dir.exists():
         return []
     images = [
@@ -55,20 +62,79 @@ def list_catalog_images(warehouse_key: str, row: dict) -> list[Path]:
     return sorted(images, key=lambda path: path.name)
 
 
+def list_catalog_images(warehouse_key: str, row: dict) -> list[Path]:
+    # The version is read before scanning, so a write racing the scan is
+    # always followed by a newer version.
+    version = catalog_version(warehouse_key)
+    cached = _IMAGE_LISTS.get(warehouse_key)
+    if cached is None or cached[0] != version:
+        cached = (version, {})
+        _IMAGE_LISTS[warehouse_key] = cached
+    catalog_id = catalog_id_for_row(row)
+    images = cached[1].get(catalog_id)
+    if images is None:
+        images = _scan_catalog_images(catalog_dir_path(warehouse_key, row))
+        cached[1][catalog_id] = images
+    return list(images)
+
+
 def catalog_image_count(warehouse_key: str, row: dict) -> int:
     return len(list_catalog_images(warehouse_key, row))
 
 
+def catalog_version(warehouse_key: str) -> int:
+    return read_version(catalog_root(warehouse_key))
+
+
 def clear_catalog(warehouse_key: str, row: dict) -> None:
     catalog_dir = catalog_dir_path(warehouse_key, row)
-    if catalog_dir.exists():
-        rmtree(catalog_dir)
+    with file_lock(catalog_root(warehouse_key)):
+        if catalog_dir.exists():
+            rmtree(catalog_dir)
+            bump_version(catalog_root(warehouse_key))
+
+
+def _file_ids_path(warehouse_key: str, row: dict) -> Path:
+    return catalog_dir_path(warehouse_key, row) / FILE_IDS_NAME
+
+
+def catalog_file_ids(warehouse_key: str, row: dict) -> dict[str, str]:
+    # Telegram photo file_ids by image file name, so a catalog already sent
+    # once is re-sent by id instead of uploading the images again.
+    try:
+        return json.loads(_file_ids_path(warehouse_key, row).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_file_ids(warehouse_key: str, row: dict, file_ids: dict[str, str]) -> None:
+    path = _file_ids_path(warehouse_key, row)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        tmp_path.write_text(json.dumps(file_ids), encoding="utf-8")
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def remember_catalog_file_ids(warehouse_key: str, row: dict, file_ids: dict[str, str]) -> None:
+    with file_lock(catalog_root(warehouse_key)):
+        if not catalog_dir_path(warehouse_key, row).exists():
+            return
+        current = catalog_file_ids(warehouse_key, row)
+        current.update(file_ids)
+        _write_file_ids(warehouse_key, row, current)
+
+
+def forget_catalog_file_ids(warehouse_key: str, row: dict) -> None:
+    with file_lock(catalog_root(warehouse_key)):
+        _file_ids_path(warehouse_key, row).unlink(missing_ok=True)
 
 
 def next_catalog_image_path(warehouse_key: str, row: dict, extension: str) -> Path:
     catalog_dir = catalog_dir_path(warehouse_key, row)
     catalog_dir.mkdir(parents=True, exist_ok=True)
-    count = catalog_image_count(warehouse_key, row)
+    count = len(_scan_catalog_images(catalog_dir))
     if count >= MAX_CATALOG_IMAGES:
         raise ValueError("Catalog image limit reached.")
     ext = extension.lower().strip()
@@ -78,3 +144,26 @@ def next_catalog_image_path(warehouse_key: str, row: dict, extension: str) -> Pa
         ext = ".jpg"
     index = count + 1
     return catalog_dir / f"img_{index:02d}{ext}"
+
+
+def add_catalog_image(
+    warehouse_key: str,
+    row: dict,
+    extension: str,
+    data: bytes,
+    file_id: str | None = None,
+) -> int:
+    with file_lock(catalog_root(warehouse_key)):
+        path = next_catalog_image_path(warehouse_key, row, extension)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        if file_id:
+            file_ids = catalog_file_ids(warehouse_key, row)
+            file_ids[path.name] = file_id
+            _write_file_ids(warehouse_key, row, file_ids)
+        bump_version(catalog_root(warehouse_key))
+        return catalog_image_count(warehouse_key, row)
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from contextlib import suppress
+
+from telegram.ext import Application
+
+from .async_storage import compact_template_journal
+from .config import WAREHOUSE_KEYS, warehouse_template_path
+from .storage import template_journal_due
+
+_CHECK_INTERVAL = 5.0
+
+
+async def _compact_journals(force: bool) -> None:
+    for key in WAREHOUSE_KEYS:
+        template_path = warehouse_template_path(key)
+        if not force and not template_journal_due(template_path):
+            continue
+        try:
+            await compact_template_journal(template_path)
+        except Exception:
+            logging.exception("Failed to compact template journal for %s.", key)
+
+
+async def _compact_loop() -> None:
+    while True:
+        await asyncio.sleep(_CHECK_INTERVAL)
+        await _compact_journals(force=False)
+
+
+async def start_journal_compactor(app: Application) -> None:
+    # Fold in any journal an earlier run left behind, including one written
+    # before journaling was switched off.
+    await _compact_journals(force=True)
+    app.bot_data["journal_compactor"] = asyncio.create_task(_compact_loop())
+
+
+async def stop_journal_compactor(app: Application) -> None:
+    task = app.bot_data.pop("journal_compactor", None)
+    if task is not None:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await _compact_journals(force=True)
@@ -2,10 +2,11 @@ import os
 import sys
 from pathlib import Path
 from shutil import copy2
-from threading import Lock
 
 from dotenv import load_dotenv
 
+from .locks import bump_version, template_lock
+
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
@@ -19,7 +20,10 @@ ALLOWED_METRICS = {"physical", "sellable", "reserved"}
 DATA_DIR = ROOT_DIR / "data"
 TEMPLATE_DIR = ROOT_DIR / "template"
 TEMPLATE_PATH = TEMPLATE_DIR / "template.xlsx"
-TEMPLATE_LOCK = Lock()
+TEMPLATE_BACKEND = os.getenv("BOT_TEMPLATE_BACKEND", "xlsx")
+TEMPLATE_JOURNAL = os.getenv("BOT_TEMPLATE_JOURNAL", "0") == "1"
+JOURNAL_COMPACT_BYTES = int(os.getenv("BOT_JOURNAL_COMPACT_BYTES", "65536"))
+JOURNAL_QUIET_SECONDS = float(os.getenv("BOT_JOURNAL_QUIET_SECONDS", "30"))
 WAREHOUSE_KEYS = ("fakhar", "dorin")
 
 CONNECT_TIMEOUT = float(os.getenv("BOT_CONNECT_TIMEOUT", "30"))
@@ -28,10 +32,28 @@ WRITE_TIMEOUT = float(os.getenv("BOT_WRITE_TIMEOUT", "60"))
 POOL_TIMEOUT = float(os.getenv("BOT_POOL_TIMEOUT", "30"))
 PROCESS_TIMEOUT_ENV = os.getenv("BOT_PROCESS_TIMEOUT", "")
 PROCESS_TIMEOUT = float(PROCESS_TIMEOUT_ENV) if PROCESS_TIMEOUT_ENV else None
+PROCESS_WORKERS = int(os.getenv("BOT_PROCESS_WORKERS", "1"))
+STORAGE_THREADS = int(os.getenv("BOT_STORAGE_THREADS", "4"))
+DOCUMENT_CACHE_SIZE = int(os.getenv("BOT_DOCUMENT_CACHE_SIZE", "16"))
+RESULT_CACHE_SIZE = int(os.getenv("BOT_RESULT_CACHE_SIZE", "64"))
+MAX_USER_UPLOADS = int(os.getenv("BOT_MAX_USER_UPLOADS", "2"))
+MAX_QUEUED_UPLOADS = int(os.getenv("BOT_MAX_QUEUED_UPLOADS", "10"))
+GLOBAL_MESSAGE_RATE = float(os.getenv("BOT_GLOBAL_MESSAGE_RATE", "25"))
+CHAT_MESSAGE_RATE = float(os.getenv("BOT_CHAT_MESSAGE_RATE", "1"))
+CHAT_MESSAGE_BURST = float(os.getenv("BOT_CHAT_MESSAGE_BURST", "3"))
+SEND_RETRIES = int(os.getenv("BOT_SEND_RETRIES", "3"))
+REGENERATION_DEBOUNCE = float(os.getenv("BOT_REGEN_DEBOUNCE", "2"))
+if GLOBAL_MESSAGE_RATE <= 0 or CHAT_MESSAGE_RATE <= 0:
+    raise ValueError("BOT_GLOBAL_MESSAGE_RATE and BOT_CHAT_MESSAGE_RATE must be positive.")
 
 PROXY_URL = os.getenv("BOT_PROXY", "")
 REQUEST_POOL_SIZE = int(os.getenv("BOT_POOL_SIZE", "8"))
 UPDATES_POOL_SIZE = int(os.getenv("BOT_UPDATES_POOL_SIZE", "1"))
+CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "8"))
+SEARCH_RESULT_LIMIT = int(os.getenv("BOT_SEARCH_LIMIT", "50"))
+ROW_PAGE_SIZE = int(os.getenv("BOT_ROW_PAGE_SIZE", "10"))
+INLINE_RESULT_LIMIT = int(os.getenv("BOT_INLINE_LIMIT", "20"))
+INLINE_CACHE_TIME = int(os.getenv("BOT_INLINE_CACHE_TIME", "30"))
 
 
 def warehouse_dir(key: str) -> Path:
@@ -70,9 +92,12 @@ def ensure_warehouse_template_path(key: str) -> Path | None:
     if not source_path:
         return None
     data_path.parent.mkdir(parents=True, exist_ok=True)
-    with TEMPLATE_LOCK:
+    with template_lock(data_path).write():
         if not data_path.exists():
-            copy2(source_path, data_path)
+            tmp_path = data_path.with_name(f".{data_path.name}.tmp")
+            copy2(source_path, tmp_path)
+            os.replace(tmp_path, data_path)
+            bump_version(data_path)
     return data_path
 
 
@@ -0,0 +1,57 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+from telegram import InputFile, Message
+from telegram.error import BadRequest
+
+from .config import DOCUMENT_CACHE_SIZE
+from .locks import read_version
+
+# Generated documents (the sorted output, details PDFs) by what they were
+# built from. Each entry keeps the bytes and, once sent, Telegram's file_id;
+# a repeat request is answered with the file_id and falls back to the bytes
+# if Telegram no longer accepts it.
+_DOCUMENTS: OrderedDict[tuple, dict] = OrderedDict()
+
+
+def file_key(path: Path) -> tuple:
+    stat = path.stat()
+    return str(path), read_version(path), stat.st_mtime_ns, stat.st_size
+
+
+def rows_key(rows: list[dict]) -> str:
+    source = repr(
+        [(row.get("row"), row.get("code_display"), row.get("name_display")) for row in rows]
+    )
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def _store(key: tuple, entry: dict) -> None:
+    _DOCUMENTS[key] = entry
+    _DOCUMENTS.move_to_end(key)
+    while len(_DOCUMENTS) > max(0, DOCUMENT_CACHE_SIZE):
+        _DOCUMENTS.popitem(last=False)
+
+
+async def send_cached_document(message: Message, key: tuple, filename: str, build) -> None:
+    # build is awaited for the document bytes only when nothing is cached.
+    entry = _DOCUMENTS.get(key)
+    if entry is not None:
+        _DOCUMENTS.move_to_end(key)
+        if entry["file_id"]:
+            try:
+                await message.reply_document(document=entry["file_id"])
+                return
+            except BadRequest:
+                logging.warning("Cached document %s was rejected; uploading again.", filename)
+                entry["file_id"] = None
+        data = entry["data"]
+    else:
+        data = await build()
+        entry = {"data": data, "file_id": None}
+        _store(key, entry)
+    sent = await message.reply_document(document=InputFile(data, filename=filename))
+    if sent.document:
+        entry["file_id"] = sent.document.file_id
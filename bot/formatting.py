@@ -7,6 +7,8 @@ from .utils import (
 )
 
 HR = "-" * 50
+DESIGN_SEPARATOR = "=" * 50
+MESSAGE_LIMIT = 4096
 
 BASE_INFO_HEADERS = {
     normalize_query("کد محصول"),
@@ -22,18 +24,6 @@ def row_label(row: dict) -> str:
     return f"{name} ({code})"
 
 
-def build_label_map(rows: list[dict]) -> dict[str, list[dict]]:
-    label_map: dict[str, list[dict]] = {}
-    for row in rows:
-        label = row_label(row)
-        label_map.setdefault(label, []).append(row)
-    return label_map
-
-
-def build_buttons_from_labels(label_map: dict[str, list[dict]]) -> list[list[str]]:
-    return [[label] for label in label_map.keys()]
-
-
 def format_details(details: list[tuple[str, str]], use_html: bool = True) -> str:
     base_values: dict[str, tuple[str, str]] = {}
     groups: dict[str, list[tuple[str, str]]] = {
@@ -161,3 +151,45 @@ def format_details(details: list[tuple[str, str]], use_html: bool = True) -> str
     if sections and sections[-1] == HR:
         sections.pop()
     return "\n".join(sections).strip()
+
+
+def format_stock_summary(details: list[tuple[str, str]]) -> str:
+    # One line of physical and sellable stock, for places a full report does
+    # not fit, such as inline query results.
+    stock_norms = (normalize_query("فیزیکی"), normalize_query("قابل فروش"))
+    parts: list[str] = []
+    for header, value in details:
+        header_norm = normalize_query(header)
+        if header_norm in BASE_INFO_HEADERS:
+            continue
+        if not any(norm in header_norm for norm in stock_norms):
+            continue
+        meter, pallet = split_meter_pallet(value)
+        text = format_unit(meter, "متر مربع") if meter else ""
+        if pallet:
+            text = f"{text} ({format_unit(pallet, 'پالت')})".strip()
+        parts.append(f"{header}: {text}")
+    return " | ".join(parts) or "اتمام موجودی"
+
+
+def _sent_length(text: str) -> int:
+    # send_text prefixes every line with an RLM mark.
+    return len(text) + text.count("\n") + 1
+
+
+def pack_blocks(blocks: list[str], limit: int = MESSAGE_LIMIT) -> list[str]:
+    # Joins whole blocks into as few messages as fit the limit; a block is
+    # never split, so one longer than the limit goes out on its own.
+    separator = f"\n\n{DESIGN_SEPARATOR}\n\n"
+    messages: list[str] = []
+    current = ""
+    for block in blocks:
+        candidate = f"{current}{separator}{block}" if current else block
+        if current and _sent_length(candidate) > limit:
+            messages.append(current)
+            current = block
+        else:
+            current = candidate
+    if current:
+        messages.append(current)
+    return messages
@@ -2,9 +2,10 @@ import logging
 import mimetypes
 from pathlib import Path
 
-from telegram import InputMediaPhoto, Update
+from telegram import Update
 from telegram.error import NetworkError, TimedOut
 from telegram.ext import (
+    CallbackQueryHandler,
     CommandHandler,
     ConversationHandler,
     ContextTypes,
@@ -12,22 +13,25 @@ from telegram.ext import (
     filters,
 )
 
-from ..catalogs import (
-    MAX_CATALOG_IMAGES,
+from ..async_storage import (
+    add_catalog_image,
     catalog_image_count,
     clear_catalog,
+    ensure_warehouse_template_path,
+    find_template_matches_any,
     list_catalog_images,
-    next_catalog_image_path,
+    list_template_rows,
 )
-from ..config import ensure_warehouse_template_path
-from ..formatting import build_buttons_from_labels, build_label_map
+from ..catalog_media import send_catalog_photos
+from ..catalogs import MAX_CATALOG_IMAGES
+from ..config import SEARCH_RESULT_LIMIT
 from ..keyboards import (
     catalog_menu_keyboard,
     keyboard_with_back,
     main_keyboard,
     manage_menu_keyboard,
 )
-from ..storage import find_template_matches_any, list_template_rows
+from ..row_pages import row_page_callback, row_page_pattern, send_row_page
 from ..strings import (
     BACK_TEXT,
     CATALOG_DELETE_TEXT,
@@ -42,6 +46,7 @@ STATE_CATALOG_MENU = 0
 STATE_CATALOG_SELECT = 1
 STATE_CATALOG_UPLOAD = 2
 STATE_CATALOG_DELETE_CONFIRM = 3
+CATALOG_ROWS = "cat"
 
 
 async def catalogs_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -70,13 +75,13 @@ async def catalogs_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     if not mode:
         await send_text(update, "یکی از گزینه‌های منو را انتخاب کنید.")
         return STATE_CATALOG_MENU
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "قالب انبار پیدا نشد.", reply_markup=manage_menu_keyboard())
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     try:
-        matches = list_template_rows(template_path)
+        matches = await list_template_rows(template_path)
     except Exception:
         logging.exception("Failed to list template rows for catalog.")
         await send_text(update, "خواندن لیست طرح‌ها ممکن نیست.")
@@ -87,13 +92,12 @@ async def catalogs_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     context.user_data["catalog_mode"] = mode
-    context.user_data["catalog_label_map"] = build_label_map(matches)
-    buttons = build_buttons_from_labels(context.user_data["catalog_label_map"])
     await send_text(
         update,
         "طرح موردنظر را انتخاب کنید:",
-        reply_markup=keyboard_with_back(buttons),
+        reply_markup=keyboard_with_back([]),
     )
+    await send_row_page(update, context, CATALOG_ROWS, matches)
     return STATE_CATALOG_SELECT
 
 
@@ -101,20 +105,15 @@ async def catalogs_select(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     text = (update.message.text or "").strip()
     if text == BACK_TEXT:
         return await catalogs_cancel(update, context)
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "قالب انبار پیدا نشد.", reply_markup=manage_menu_keyboard())
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
-    label_map = context.user_data.get("catalog_label_map", {})
-    if text in label_map:
-        rows = label_map[text]
-        if len(rows) > 1:
-            await send_text(update, "چند طرح مشابه پیدا شد. دقیق‌تر جستجو کنید.")
-            return STATE_CATALOG_SELECT
-        return await handle_catalog_target(update, context, rows[0])
     try:
-        matches = find_template_matches_any(text, template_path)
+        matches = await find_template_matches_any(
+            text, template_path, SEARCH_RESULT_LIMIT
+        )
     except Exception:
         logging.exception("Failed to search template rows for catalog.")
         await send_text(update, "جستجو ممکن نیست. دوباره تلاش کنید.")
@@ -122,31 +121,33 @@ async def catalogs_select(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not matches:
         await send_text(update, "طرحی پیدا نشد.")
         return STATE_CATALOG_SELECT
-    label_map = build_label_map(matches)
-    context.user_data["catalog_label_map"] = label_map
-    buttons = build_buttons_from_labels(label_map)
     await send_text(
         update,
         "نتایج فیلتر شده. یکی را انتخاب کنید:",
-        reply_markup=keyboard_with_back(buttons),
+        reply_markup=keyboard_with_back([]),
     )
+    await send_row_page(update, context, CATALOG_ROWS, matches, text)
     return STATE_CATALOG_SELECT
 
 
-async def send_existing_catalog(update: Update, images: list[Path]) -> None:
-    if not images or not update.message:
-        return
-    if len(images) == 1:
-        with images[0].open("rb") as handle:
-            await update.message.reply_photo(photo=handle)
+async def catalogs_pick(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
+    if not template_path:
+        await send_text(update, "قالب انبار پیدا نشد.", reply_markup=manage_menu_keyboard())
+        context.user_data["conversation_active"] = False
+        return ConversationHandler.END
+    target = await row_page_callback(update, context, CATALOG_ROWS, template_path)
+    if target is None:
+        return STATE_CATALOG_SELECT
+    return await handle_catalog_target(update, context, target)
+
+
+async def send_existing_catalog(
+    update: Update, warehouse_key: str, target: dict, images: list[Path]
+) -> None:
+    if not images or not update.effective_message:
         return
-    handles = [path.open("rb") for path in images]
-    media = [InputMediaPhoto(handle) for handle in handles]
-    try:
-        await update.message.reply_media_group(media=media)
-    finally:
-        for handle in handles:
-            handle.close()
+    await send_catalog_photos(update.effective_message, warehouse_key, target, images)
 
 
 async def handle_catalog_target(
@@ -161,10 +162,10 @@ async def handle_catalog_target(
             reply_markup=keyboard_with_back([[CONFIRM_TEXT]]),
         )
         return STATE_CATALOG_DELETE_CONFIRM
-    existing = list_catalog_images(context.user_data["warehouse"], target)
+    existing = await list_catalog_images(context.user_data["warehouse"], target)
     existing_count = len(existing)
     if mode == "upsert" and existing:
-        await send_existing_catalog(update, existing)
+        await send_existing_catalog(update, context.user_data["warehouse"], target, existing)
     if mode == "upsert" and existing_count >= MAX_CATALOG_IMAGES:
         await send_text(
             update,
@@ -183,7 +184,7 @@ async def start_catalog_upload(
     warehouse = context.user_data.get("warehouse")
     existing_count = 0
     if warehouse:
-        existing_count = catalog_image_count(warehouse, target)
+        existing_count = await catalog_image_count(warehouse, target)
     remaining = max(0, MAX_CATALOG_IMAGES - existing_count)
     if existing_count:
         message = (
@@ -216,11 +217,11 @@ async def catalog_delete_confirm(update: Update, context: ContextTypes.DEFAULT_T
         await send_text(update, "طرح انتخاب نشده است.", reply_markup=manage_menu_keyboard())
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
-    if not list_catalog_images(context.user_data["warehouse"], target):
+    if not await list_catalog_images(context.user_data["warehouse"], target):
         await send_text(update, "کاتالوگی برای حذف پیدا نشد.", reply_markup=manage_menu_keyboard())
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
-    clear_catalog(context.user_data["warehouse"], target)
+    await clear_catalog(context.user_data["warehouse"], target)
     await send_text(update, "کاتالوگ حذف شد.", reply_markup=manage_menu_keyboard())
     context.user_data["conversation_active"] = False
     return ConversationHandler.END
@@ -236,7 +237,7 @@ async def catalog_upload_text(update: Update, context: ContextTypes.DEFAULT_TYPE
             await send_text(update, "طرح انتخاب نشده است.", reply_markup=manage_menu_keyboard())
             context.user_data["conversation_active"] = False
             return ConversationHandler.END
-        count = catalog_image_count(context.user_data["warehouse"], target)
+        count = await catalog_image_count(context.user_data["warehouse"], target)
         if count == 0:
             await send_text(update, "هنوز تصویری ارسال نشده است.")
             return STATE_CATALOG_UPLOAD
@@ -253,7 +254,7 @@ async def catalog_receive_photo(update: Update, context: ContextTypes.DEFAULT_TY
     photo = update.message.photo[-1]
     try:
         file_obj = await photo.get_file()
-        await save_catalog_file(update, context, file_obj, ".jpg")
+        await save_catalog_file(update, context, file_obj, ".jpg", photo.file_id)
     except (TimedOut, NetworkError):
         logging.exception("Telegram API request failed while downloading photo.")
         await send_text(update, "ارسال تصویر ناموفق بود. دوباره تلاش کنید.")
@@ -292,19 +293,24 @@ async def save_catalog_file(
     context: ContextTypes.DEFAULT_TYPE,
     file_obj,
     extension: str,
+    photo_file_id: str | None = None,
 ) -> None:
     warehouse = context.user_data.get("warehouse")
     target = context.user_data.get("catalog_target")
     if not warehouse or not target:
         await send_text(update, "ابتدا طرح را انتخاب کنید.")
         return
+    if await catalog_image_count(warehouse, target) >= MAX_CATALOG_IMAGES:
+        await send_text(update, f"حداکثر {MAX_CATALOG_IMAGES} تصویر مجاز است.")
+        return
+    data = await file_obj.download_as_bytearray()
     try:
-        path = next_catalog_image_path(warehouse, target, extension)
+        count = await add_catalog_image(
+            warehouse, target, extension, bytes(data), photo_file_id
+        )
     except ValueError:
         await send_text(update, f"حداکثر {MAX_CATALOG_IMAGES} تصویر مجاز است.")
         return
-    await file_obj.download_to_drive(custom_path=str(path))
-    count = catalog_image_count(warehouse, target)
     if count >= MAX_CATALOG_IMAGES:
         await send_text(update, "حداکثر تعداد تصویر ذخیره شد. برای پایان، دکمه اتمام را بزنید.")
         return
@@ -328,7 +334,8 @@ def build_catalog_handler() -> ConversationHandler:
                 MessageHandler(filters.TEXT & ~filters.COMMAND, catalogs_menu)
             ],
             STATE_CATALOG_SELECT: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, catalogs_select)
+                MessageHandler(filters.TEXT & ~filters.COMMAND, catalogs_select),
+                CallbackQueryHandler(catalogs_pick, pattern=row_page_pattern(CATALOG_ROWS)),
             ],
             STATE_CATALOG_DELETE_CONFIRM: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, catalog_delete_confirm)
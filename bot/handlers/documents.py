@@ -1,26 +1,46 @@
 import asyncio
 import logging
-import time
 from io import BytesIO
-from pathlib import Path
-from shutil import rmtree
-from tempfile import mkdtemp
 
 from telegram import InputFile, Update
-from telegram.error import NetworkError, TimedOut
+from telegram.error import BadRequest, NetworkError, TimedOut
 from telegram.ext import ContextTypes
 
-from build_output import process_files
+from build_output import process_bytes
 
+from ..admission import admit_upload, claim_content, queue_position, release_upload
+from ..async_storage import (
+    data_digest,
+    ensure_warehouse_template_path,
+    export_template,
+)
 from ..config import (
     DEFAULT_METRIC,
     ALLOWED_METRICS,
-    PROCESS_TIMEOUT,
-    ensure_warehouse_template_path,
 )
+from ..locks import read_version
+from ..processing import run_processing
+from ..result_cache import cached_result, forget_result, store_result
 from ..text import send_text
 
 
+async def send_cached_output(update: Update, file_id: str) -> bool:
+    # Returns False only when Telegram rejected the cached file, so the caller
+    # builds the output again; a network failure is reported to the user.
+    try:
+        await update.message.reply_document(document=file_id)
+    except BadRequest:
+        logging.warning("Cached output %s was rejected; rebuilding.", file_id)
+        forget_result(file_id)
+        return False
+    except (TimedOut, NetworkError):
+        logging.exception("Failed to send cached output.")
+        await send_text(update, "خطای شبکه. دوباره تلاش کنید.")
+        return True
+    logging.info("Sent cached output.")
+    return True
+
+
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message or not update.message.document:
         return
@@ -32,45 +52,63 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not (filename.lower().endswith(".xlsx") or filename.lower().endswith(".pdf")):
         await send_text(update, "فقط فایل .xlsx یا .pdf ارسال کنید.")
         return
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    warehouse = context.user_data["warehouse"]
+    template_path = await ensure_warehouse_template_path(warehouse)
     if not template_path:
         await send_text(update, "تمپلیت پیدا نشد.")
         return
+    metric = DEFAULT_METRIC if DEFAULT_METRIC in ALLOWED_METRICS else "physical"
+    cached_id = cached_result(
+        template_path, read_version(template_path), metric, [document.file_unique_id]
+    )
+    if cached_id and await send_cached_output(update, cached_id):
+        return
+
+    user_id = update.effective_user.id
+    job, refusal = admit_upload(user_id, (warehouse, user_id), document.file_unique_id)
+    if not job:
+        await send_text(update, refusal)
+        return
 
     logging.info("Received document: %s (%s bytes)", filename, document.file_size)
-    metric = DEFAULT_METRIC if DEFAULT_METRIC in ALLOWED_METRICS else "physical"
-    tmpdir_path = Path(mkdtemp())
-    input_suffix = ".pdf" if filename.lower().endswith(".pdf") else ".xlsx"
-    input_path = tmpdir_path / f"input{input_suffix}"
-    output_path = tmpdir_path / "output_from_template.xlsx"
     try:
+        position = queue_position(job)
+        if position:
+            await send_text(update, f"فایل در صف پردازش قرار گرفت. نوبت شما: {position}")
         logging.info("Fetching file info from Telegram.")
         file_obj = await document.get_file()
-        logging.info("Downloading file to %s.", input_path)
-        await file_obj.download_to_drive(custom_path=str(input_path))
-        logging.info("Download complete. Starting processing.")
-        loop = asyncio.get_running_loop()
-        processing_task = loop.run_in_executor(
-            None,
-            process_files,
-            input_path,
-            template_path,
-            output_path,
-            metric,
-            None,
-            False,
+        input_buffer = BytesIO()
+        await file_obj.download_to_memory(out=input_buffer)
+        input_data = input_buffer.getvalue()
+        digest = await data_digest(input_data)
+        version = read_version(template_path)
+        cached_id = cached_result(template_path, version, metric, [digest])
+        if cached_id and await send_cached_output(update, cached_id):
+            store_result(template_path, version, metric, [document.file_unique_id], cached_id)
+            return
+        if not claim_content(job, digest):
+            await send_text(update, "همین فایل در صف پردازش است؛ نتیجه همان ارسال می‌شود.")
+            return
+        logging.info("Download complete (%s bytes). Starting processing.", len(input_data))
+        await export_template(template_path)
+        version = read_version(template_path)
+        output_data = await run_processing(
+            process_bytes, input_data, filename, template_path, metric
         )
-        if PROCESS_TIMEOUT:
-            await asyncio.wait_for(processing_task, timeout=PROCESS_TIMEOUT)
-        else:
-            await processing_task
         logging.info("Processing done. Uploading output.")
-        output_bytes = output_path.read_bytes()
-        buffer = BytesIO(output_bytes)
-        buffer.seek(0)
-        await update.message.reply_document(
-            document=InputFile(buffer, filename="output_from_template.xlsx")
+        message = await update.message.reply_document(
+            document=InputFile(output_data, filename="output_from_template.xlsx")
         )
+        # An edit during the build may or may not be in this output, so it
+        # is only cached when the template did not change meanwhile.
+        if message.document and read_version(template_path) == version:
+            store_result(
+                template_path,
+                version,
+                metric,
+                [document.file_unique_id, digest],
+                message.document.file_id,
+            )
         logging.info("Output sent successfully.")
     except asyncio.TimeoutError:
         logging.exception("Timeout while processing request.")
@@ -81,11 +119,5 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     except Exception:
         logging.exception("Failed to process file.")
         await send_text(update, "پردازش انجام نشد. دوباره تلاش کنید.")
-        return
     finally:
-        for _ in range(5):
-            try:
-                rmtree(tmpdir_path)
-                break
-            except PermissionError:
-                time.sleep(0.2)
+        release_upload(job)
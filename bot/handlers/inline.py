@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import ContextTypes
+
+from ..async_storage import (
+    ensure_warehouse_template_path,
+    find_template_matches_any,
+    get_output_rows_details,
+)
+from ..config import (
+    INLINE_CACHE_TIME,
+    INLINE_RESULT_LIMIT,
+    WAREHOUSE_KEYS,
+    warehouse_output_path,
+)
+from ..formatting import MESSAGE_LIMIT, format_details, format_stock_summary, row_label
+from ..strings import WAREHOUSE_LABELS
+from ..text import rtl
+
+# Telegram accepts at most 50 results per answer.
+MAX_INLINE_RESULTS = 50
+
+
+async def _warehouse_matches(key: str, query: str, limit: int) -> list[tuple[dict, list]]:
+    template_path = await ensure_warehouse_template_path(key)
+    if not template_path:
+        return []
+    try:
+        rows = await find_template_matches_any(query, template_path, limit)
+    except Exception:
+        logging.exception("Inline search failed for warehouse %s.", key)
+        return []
+    try:
+        details = await get_output_rows_details(rows, warehouse_output_path(key))
+    except FileNotFoundError:
+        details = [[] for _ in rows]
+    except Exception:
+        logging.exception("Failed to read output details for warehouse %s.", key)
+        details = [[] for _ in rows]
+    return list(zip(rows, details))
+
+
+def _inline_result(key: str, row: dict, details: list) -> InlineQueryResultArticle:
+    warehouse = WAREHOUSE_LABELS.get(key, key)
+    summary = format_stock_summary(details) if details else "جزئیاتی پیدا نشد."
+    content = None
+    if details:
+        text = rtl(f"{warehouse}\n\n{format_details(details)}")
+        if len(text) <= MESSAGE_LIMIT:
+            content = InputTextMessageContent(text, parse_mode="HTML")
+    if content is None:
+        # Plain text, so it can be cut safely: one oversized result would
+        # make Telegram reject the whole answer.
+        text = rtl(f"{warehouse}\n\n{row_label(row)}\n{summary}")
+        content = InputTextMessageContent(text[:MESSAGE_LIMIT])
+    return InlineQueryResultArticle(
+        id=f"{key}:{row['row']}",
+        title=row_label(row),
+        description=f"{warehouse} - {summary}",
+        input_message_content=content,
+    )
+
+
+async def inline_lookup(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    inline_query = update.inline_query
+    query = inline_query.query.strip()
+    if not query:
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME)
+        return
+    limit = max(1, min(INLINE_RESULT_LIMIT, MAX_INLINE_RESULTS))
+    per_warehouse = await asyncio.gather(
+        *(_warehouse_matches(key, query, limit) for key in WAREHOUSE_KEYS)
+    )
+    # Each warehouse's matches are already ranked; interleave them by rank so
+    # the best match of every warehouse comes first.
+    ranked = sorted(
+        (
+            (rank, order, key, row, details)
+            for order, (key, matches) in enumerate(zip(WAREHOUSE_KEYS, per_warehouse))
+            for rank, (row, details) in enumerate(matches)
+        ),
+        key=lambda item: item[:2],
+    )
+    results = [_inline_result(key, row, details) for _, _, key, row, details in ranked[:limit]]
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME)
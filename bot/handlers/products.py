@@ -1,5 +1,6 @@
-import asyncio
 import logging
+import os
+import uuid
 
 from telegram import Update
 from telegram.error import NetworkError, TimedOut
@@ -11,17 +12,19 @@ from telegram.ext import (
     filters,
 )
 
-from build_output import process_files
-
+from ..admission import admit_upload, claim_content, queue_position, release_upload
+from ..async_storage import (
+    ensure_warehouse_template_path,
+    file_digest,
+    read_file_bytes,
+)
 from ..config import (
-    ALLOWED_METRICS,
-    DEFAULT_METRIC,
-    PROCESS_TIMEOUT,
     warehouse_input_path,
     warehouse_output_path,
-    ensure_warehouse_template_path,
 )
+from ..document_cache import file_key, send_cached_document
 from ..keyboards import main_keyboard, manage_menu_keyboard, products_menu_keyboard
+from ..regeneration import request_regeneration
 from ..strings import (
     BACK_TEXT,
     PRODUCTS_DOWNLOAD_TEXT,
@@ -63,11 +66,12 @@ async def products_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         if not output_path.exists():
             await send_text(update, "فایل مرتب‌شده موجود نیست.")
             return STATE_PRODUCTS_MENU
-        with output_path.open("rb") as handle:
-            await update.message.reply_document(
-                document=handle,
-                filename=output_path.name,
-            )
+        await send_cached_document(
+            update.message,
+            ("output", *file_key(output_path)),
+            output_path.name,
+            lambda: read_file_bytes(output_path),
+        )
         return STATE_PRODUCTS_MENU
     await send_text(update, "یکی از گزینه‌ها را انتخاب کنید.")
     return STATE_PRODUCTS_MENU
@@ -82,47 +86,58 @@ async def products_receive_file(update: Update, context: ContextTypes.DEFAULT_TY
     if not (filename.lower().endswith(".xlsx") or filename.lower().endswith(".pdf")):
         await send_text(update, "فایل باید .xlsx یا .pdf باشد.")
         return STATE_PRODUCTS_WAIT_FILE
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    warehouse = context.user_data["warehouse"]
+    template_path = await ensure_warehouse_template_path(warehouse)
     if not template_path:
         await send_text(update, "تمپلیت پیدا نشد.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
-    metric = DEFAULT_METRIC if DEFAULT_METRIC in ALLOWED_METRICS else "physical"
+    # Scoped to the warehouse rather than the user: every upload replaces the
+    # same input file, so the same file from anyone is a duplicate.
+    job, refusal = admit_upload(
+        update.effective_user.id, ("products", warehouse), document.file_unique_id
+    )
+    if not job:
+        await send_text(update, refusal)
+        return STATE_PRODUCTS_WAIT_FILE
     suffix = ".pdf" if filename.lower().endswith(".pdf") else ".xlsx"
-    input_path = warehouse_input_path(context.user_data["warehouse"], suffix)
-    output_path = warehouse_output_path(context.user_data["warehouse"])
+    input_path = warehouse_input_path(warehouse, suffix)
+    handed_off = False
     try:
+        position = queue_position(job)
+        if position:
+            await send_text(update, f"فایل در صف پردازش قرار گرفت. نوبت شما: {position}")
         file_obj = await document.get_file()
-        await file_obj.download_to_drive(custom_path=str(input_path))
-        loop = asyncio.get_running_loop()
-        processing_task = loop.run_in_executor(
-            None,
-            process_files,
-            input_path,
-            template_path,
-            output_path,
-            metric,
-            None,
-            False,
-        )
-        if PROCESS_TIMEOUT:
-            await asyncio.wait_for(processing_task, timeout=PROCESS_TIMEOUT)
+        tmp_path = input_path.with_name(f".{input_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            await file_obj.download_to_drive(custom_path=str(tmp_path))
+            digest = await file_digest(tmp_path)
+            if not claim_content(job, digest):
+                await send_text(update, "همین فایل در حال ذخیره است.")
+                return STATE_PRODUCTS_MENU
+            os.replace(tmp_path, input_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        queued = request_regeneration(context.bot, warehouse, update.effective_chat.id, job)
+        handed_off = True
+        if queued:
+            status = "ساخت فایل مرتب‌شده بعد از ساخت فعلی انجام می‌شود."
         else:
-            await processing_task
+            status = "ساخت فایل مرتب‌شده شروع شد."
         await send_text(
             update,
-            "فایل مرتب‌شده ذخیره شد. برای دریافت، دکمه مربوطه را بزنید.",
+            f"فایل محصولات ذخیره شد. {status} پس از پایان اطلاع داده می‌شود.",
             reply_markup=products_menu_keyboard(),
         )
-    except asyncio.TimeoutError:
-        logging.exception("Timeout while processing products file.")
-        await send_text(update, "زمان پردازش تمام شد. دوباره تلاش کنید.")
     except (TimedOut, NetworkError):
         logging.exception("Telegram API request failed.")
         await send_text(update, "مشکل شبکه. دوباره تلاش کنید.")
     except Exception:
         logging.exception("Failed to process products file.")
         await send_text(update, "پردازش انجام نشد. دوباره تلاش کنید.")
+    finally:
+        if not handed_off:
+            release_upload(job)
     return STATE_PRODUCTS_MENU
 
 
@@ -1,8 +1,8 @@
-import asyncio
 import logging
 from decimal import Decimal, InvalidOperation
 
 from telegram.ext import (
+    CallbackQueryHandler,
     CommandHandler,
     ConversationHandler,
     ContextTypes,
@@ -10,27 +10,39 @@ from telegram.ext import (
     filters,
 )
 from telegram import Update
+from telegram.error import NetworkError, TimedOut
 
-from build_output import process_files
-
-from ..config import (
-    ALLOWED_METRICS,
-    DEFAULT_METRIC,
-    PROCESS_TIMEOUT,
-    resolve_warehouse_input_path,
-    ensure_warehouse_template_path,
-    warehouse_output_path,
-)
-from ..formatting import build_buttons_from_labels, build_label_map
-from ..keyboards import keyboard_with_back, main_keyboard, manage_rows_keyboard
-from ..storage import (
+from ..async_storage import (
     append_template_row,
+    apply_template_changes,
     delete_template_row,
+    ensure_warehouse_template_path,
     find_template_matches_any,
     list_template_rows,
+    read_import_rows,
     update_template_row,
+    upsert_template_rows,
+)
+from ..config import (
+    SEARCH_RESULT_LIMIT,
+    resolve_warehouse_input_path,
+)
+from ..formatting import row_label
+from ..keyboards import keyboard_with_back, main_keyboard, manage_rows_keyboard
+from ..regeneration import request_regeneration
+from ..row_pages import row_page_callback, row_page_pattern, send_row_page
+from ..strings import (
+    ADD_ROW_TEXT,
+    BACK_TEXT,
+    COMMIT_CHANGES_TEXT,
+    CONFIRM_TEXT,
+    DELETE_ROW_TEXT,
+    DISCARD_CHANGES_TEXT,
+    EDIT_ROW_TEXT,
+    IMPORT_ROWS_TEXT,
+    REVIEW_CHANGES_TEXT,
+    STAGE_CHANGE_TEXT,
 )
-from ..strings import ADD_ROW_TEXT, BACK_TEXT, CONFIRM_TEXT, DELETE_ROW_TEXT, EDIT_ROW_TEXT
 from ..text import send_text
 
 STATE_CODE, STATE_NAME, STATE_SIZE, STATE_DIVISOR, STATE_CONFIRM = range(5)
@@ -43,6 +55,11 @@ STATE_DEL_LIST, STATE_DEL_CONFIRM = range(5, 7)
     STATE_EDIT_DIVISOR,
     STATE_EDIT_CONFIRM,
 ) = range(7, 13)
+STATE_REVIEW = 13
+STATE_IMPORT_FILE, STATE_IMPORT_CONFIRM = range(14, 16)
+DELETE_ROWS = "del"
+EDIT_ROWS = "edit"
+MAX_IMPORT_ERRORS = 10
 
 
 def keyboard_with_old_value(old_value: str):
@@ -52,6 +69,40 @@ def keyboard_with_old_value(old_value: str):
     return keyboard_with_back(rows)
 
 
+def confirm_keyboard():
+    return keyboard_with_back([[CONFIRM_TEXT], [STAGE_CHANGE_TEXT]])
+
+
+def pending_changes(context: ContextTypes.DEFAULT_TYPE) -> list[dict]:
+    pending = context.user_data.setdefault("pending_changes", {})
+    return pending.setdefault(context.user_data["warehouse"], [])
+
+
+def describe_change(change: dict) -> str:
+    if change["action"] == "delete":
+        return f"حذف: {row_label(change['target'])}"
+    values = change["values"]
+    label = f"{values['name']} ({values['code']})"
+    if change["action"] == "edit":
+        return f"ویرایش: {row_label(change['target'])} ← {label}"
+    return f"افزودن: {label}"
+
+
+async def stage_change(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, change: dict
+) -> int:
+    changes = pending_changes(context)
+    changes.append(change)
+    await send_text(
+        update,
+        f"به لیست تغییرات اضافه شد. {len(changes)} تغییر در انتظار ثبت است.",
+        reply_markup=manage_rows_keyboard(),
+    )
+    context.user_data["menu_level"] = "manage_rows"
+    context.user_data["conversation_active"] = False
+    return ConversationHandler.END
+
+
 async def regenerate_output(
     update: Update, context: ContextTypes.DEFAULT_TYPE, note_prefix: str
 ) -> None:
@@ -60,10 +111,7 @@ async def regenerate_output(
         await send_text(update, "اول انبار را انتخاب کنید.", reply_markup=main_keyboard())
         context.user_data["menu_level"] = "main"
         return
-    input_path = resolve_warehouse_input_path(warehouse)
-    output_path = warehouse_output_path(warehouse)
-    template_path = ensure_warehouse_template_path(warehouse)
-    if not input_path:
+    if not resolve_warehouse_input_path(warehouse):
         await send_text(
             update,
             f"{note_prefix}\nبرای بروزرسانی خروجی، فایل محصولات را ارسال کنید.",
@@ -71,53 +119,17 @@ async def regenerate_output(
         )
         context.user_data["menu_level"] = "manage_rows"
         return
-    if not template_path:
-        await send_text(
-            update,
-            f"{note_prefix}\nتمپلیت پیدا نشد.",
-            reply_markup=manage_rows_keyboard(),
-        )
-        context.user_data["menu_level"] = "manage_rows"
-        return
-    metric = DEFAULT_METRIC if DEFAULT_METRIC in ALLOWED_METRICS else "physical"
-    try:
-        loop = asyncio.get_running_loop()
-        task = loop.run_in_executor(
-            None,
-            process_files,
-            input_path,
-            template_path,
-            output_path,
-            metric,
-            None,
-            False,
-        )
-        if PROCESS_TIMEOUT:
-            await asyncio.wait_for(task, timeout=PROCESS_TIMEOUT)
-        else:
-            await task
-        await send_text(
-            update,
-            f"{note_prefix}\nخروجی بروزرسانی شد.",
-            reply_markup=manage_rows_keyboard(),
-        )
-        context.user_data["menu_level"] = "manage_rows"
-    except asyncio.TimeoutError:
-        logging.exception("Timeout while regenerating output.")
-        await send_text(
-            update,
-            f"{note_prefix}\nبروزرسانی خروجی به زمان بیشتری نیاز دارد.",
-            reply_markup=manage_rows_keyboard(),
-        )
-        context.user_data["menu_level"] = "manage_rows"
-    except Exception:
-        logging.exception("Failed to regenerate output.")
-        await send_text(
-            update,
-            f"{note_prefix}\nبروزرسانی خروجی انجام نشد.",
-            reply_markup=manage_rows_keyboard(),
-        )
-        context.user_data["menu_level"] = "manage_rows"
+    queued = request_regeneration(context.bot, warehouse, update.effective_chat.id)
+    if queued:
+        status = "بروزرسانی خروجی بعد از ساخت فعلی انجام می‌شود."
+    else:
+        status = "بروزرسانی خروجی شروع شد."
+    await send_text(
+        update,
+        f"{note_prefix}\n{status} پس از پایان اطلاع داده می‌شود.",
+        reply_markup=manage_rows_keyboard(),
+    )
+    context.user_data["menu_level"] = "manage_rows"
 
 
 async def add_row_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -186,9 +198,7 @@ async def add_row_divisor(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         f"مقدار تقسیم پالت: {row['divisor']}\n"
         "تایید می‌کنید؟"
     )
-    await send_text(
-        update, summary, reply_markup=keyboard_with_back([[CONFIRM_TEXT]])
-    )
+    await send_text(update, summary, reply_markup=confirm_keyboard())
     return STATE_CONFIRM
 
 
@@ -196,18 +206,25 @@ async def add_row_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     text = (update.message.text or "").strip()
     if text == BACK_TEXT:
         return await add_row_cancel(update, context)
+    if text == STAGE_CHANGE_TEXT:
+        row = dict(context.user_data.get("new_row", {}))
+        return await stage_change(update, context, {"action": "add", "values": row})
     if text != CONFIRM_TEXT:
         await send_text(update, "برای ادامه روی تایید بزنید یا برگشت کنید.")
         return STATE_CONFIRM
     row = context.user_data.get("new_row", {})
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "?????? ???? ???.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     try:
-        new_row = append_template_row(
-            row["code"], row["name"], row["size"], row["divisor"], template_path
+        new_row = await append_template_row(
+            row["code"],
+            row["name"],
+            row["size"],
+            row["divisor"],
+            template_path,
         )
     except Exception:
         logging.exception("Failed to append template row.")
@@ -235,55 +252,40 @@ async def delete_row_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         context.user_data["menu_level"] = "main"
         return ConversationHandler.END
     context.user_data["conversation_active"] = True
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "?????? ???? ???.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     try:
-        matches = list_template_rows(template_path)
+        matches = await list_template_rows(template_path)
     except Exception:
         logging.exception("Failed to list template rows.")
         await send_text(update, "لیست طرح‌ها قابل دریافت نیست.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
-    context.user_data["delete_label_map"] = build_label_map(matches)
-    buttons = build_buttons_from_labels(context.user_data["delete_label_map"])
     await send_text(
         update,
         "لیست طرح‌ها. برای جستجو متن وارد کنید یا یکی را انتخاب کنید:",
-        reply_markup=keyboard_with_back(buttons),
+        reply_markup=keyboard_with_back([]),
     )
+    await send_row_page(update, context, DELETE_ROWS, matches)
     return STATE_DEL_LIST
 
 
 async def delete_row_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     text = (update.message.text or "").strip()
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "?????? ???? ???.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     if text == BACK_TEXT:
         return await delete_row_cancel(update, context)
-    label_map = context.user_data.get("delete_label_map", {})
-    if text in label_map:
-        rows = label_map[text]
-        if len(rows) > 1:
-            await send_text(
-                update, "چند مورد با این عنوان وجود دارد. متن دقیق‌تری وارد کنید."
-            )
-            return STATE_DEL_LIST
-        target = rows[0]
-        context.user_data["delete_target"] = target
-        await send_text(
-            update,
-            f"این طرح حذف شود؟\n{text}",
-            reply_markup=keyboard_with_back([[CONFIRM_TEXT]]),
-        )
-        return STATE_DEL_CONFIRM
     try:
-        matches = find_template_matches_any(text, template_path)
+        matches = await find_template_matches_any(
+            text, template_path, SEARCH_RESULT_LIMIT
+        )
     except Exception:
         logging.exception("Failed to search template rows.")
         await send_text(update, "جستجو انجام نشد. دوباره تلاش کنید.")
@@ -291,22 +293,44 @@ async def delete_row_list(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not matches:
         await send_text(update, "موردی پیدا نشد.")
         return STATE_DEL_LIST
-    label_map = build_label_map(matches)
-    context.user_data["delete_label_map"] = label_map
-    buttons = build_buttons_from_labels(label_map)
     await send_text(
         update,
         "نتیجه جستجو. یکی را انتخاب کنید:",
-        reply_markup=keyboard_with_back(buttons),
+        reply_markup=keyboard_with_back([]),
     )
+    await send_row_page(update, context, DELETE_ROWS, matches, text)
     return STATE_DEL_LIST
 
 
+async def delete_row_pick(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
+    if not template_path:
+        await send_text(update, "?????? ???? ???.")
+        context.user_data["conversation_active"] = False
+        return ConversationHandler.END
+    target = await row_page_callback(update, context, DELETE_ROWS, template_path)
+    if target is None:
+        return STATE_DEL_LIST
+    return await delete_row_select(update, context, target)
+
+
+async def delete_row_select(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, target: dict
+) -> int:
+    context.user_data["delete_target"] = target
+    await send_text(
+        update,
+        f"این طرح حذف شود؟\n{row_label(target)}",
+        reply_markup=confirm_keyboard(),
+    )
+    return STATE_DEL_CONFIRM
+
+
 async def delete_row_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     text = (update.message.text or "").strip()
     if text == BACK_TEXT:
         return await delete_row_cancel(update, context)
-    if text != CONFIRM_TEXT:
+    if text not in (CONFIRM_TEXT, STAGE_CHANGE_TEXT):
         await send_text(update, "برای ادامه روی تایید بزنید یا برگشت کنید.")
         return STATE_DEL_CONFIRM
     target = context.user_data.get("delete_target")
@@ -314,13 +338,15 @@ async def delete_row_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await send_text(update, "موردی برای حذف انتخاب نشده است.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    if text == STAGE_CHANGE_TEXT:
+        return await stage_change(update, context, {"action": "delete", "target": target})
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "?????? ???? ???.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     try:
-        deleted = delete_template_row(target, template_path)
+        deleted = await delete_template_row(target, template_path)
     except Exception:
         logging.exception("Failed to delete template row.")
         await send_text(update, "حذف انجام نشد. دوباره تلاش کنید.")
@@ -350,57 +376,40 @@ async def edit_row_start(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         context.user_data["menu_level"] = "main"
         return ConversationHandler.END
     context.user_data["conversation_active"] = True
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "?????? ???? ???.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     try:
-        matches = list_template_rows(template_path)
+        matches = await list_template_rows(template_path)
     except Exception:
         logging.exception("Failed to list template rows.")
         await send_text(update, "لیست طرح‌ها قابل دریافت نیست.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
-    context.user_data["edit_label_map"] = build_label_map(matches)
-    buttons = build_buttons_from_labels(context.user_data["edit_label_map"])
     await send_text(
         update,
         "لیست طرح‌ها. برای جستجو متن وارد کنید یا یکی را انتخاب کنید:",
-        reply_markup=keyboard_with_back(buttons),
+        reply_markup=keyboard_with_back([]),
     )
+    await send_row_page(update, context, EDIT_ROWS, matches)
     return STATE_EDIT_LIST
 
 
 async def edit_row_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     text = (update.message.text or "").strip()
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "?????? ???? ???.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     if text == BACK_TEXT:
         return await edit_row_cancel(update, context)
-    label_map = context.user_data.get("edit_label_map", {})
-    if text in label_map:
-        rows = label_map[text]
-        if len(rows) > 1:
-            await send_text(
-                update, "چند مورد با این عنوان وجود دارد. متن دقیق‌تری وارد کنید."
-            )
-            return STATE_EDIT_LIST
-        target = rows[0]
-        context.user_data["edit_original"] = target
-        context.user_data["edit_new"] = {}
-        old_code = target.get("code_display", "")
-        await send_text(
-            update,
-            "کد کالا جدید را وارد کنید.",
-            reply_markup=keyboard_with_old_value(old_code),
-        )
-        return STATE_EDIT_CODE
     try:
-        matches = find_template_matches_any(text, template_path)
+        matches = await find_template_matches_any(
+            text, template_path, SEARCH_RESULT_LIMIT
+        )
     except Exception:
         logging.exception("Failed to search template rows.")
         await send_text(update, "جستجو انجام نشد. دوباره تلاش کنید.")
@@ -408,17 +417,41 @@ async def edit_row_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     if not matches:
         await send_text(update, "موردی پیدا نشد.")
         return STATE_EDIT_LIST
-    label_map = build_label_map(matches)
-    context.user_data["edit_label_map"] = label_map
-    buttons = build_buttons_from_labels(label_map)
     await send_text(
         update,
         "نتیجه جستجو. یکی را انتخاب کنید:",
-        reply_markup=keyboard_with_back(buttons),
+        reply_markup=keyboard_with_back([]),
     )
+    await send_row_page(update, context, EDIT_ROWS, matches, text)
     return STATE_EDIT_LIST
 
 
+async def edit_row_pick(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
+    if not template_path:
+        await send_text(update, "?????? ???? ???.")
+        context.user_data["conversation_active"] = False
+        return ConversationHandler.END
+    target = await row_page_callback(update, context, EDIT_ROWS, template_path)
+    if target is None:
+        return STATE_EDIT_LIST
+    return await edit_row_select(update, context, target)
+
+
+async def edit_row_select(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, target: dict
+) -> int:
+    context.user_data["edit_original"] = target
+    context.user_data["edit_new"] = {}
+    old_code = target.get("code_display", "")
+    await send_text(
+        update,
+        "کد کالا جدید را وارد کنید.",
+        reply_markup=keyboard_with_old_value(old_code),
+    )
+    return STATE_EDIT_CODE
+
+
 async def edit_row_code(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     text = (update.message.text or "").strip()
     if text == BACK_TEXT:
@@ -489,9 +522,7 @@ async def edit_row_divisor(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         f"مقدار تقسیم پالت: {new_vals['divisor']}\n"
         "تایید می‌کنید؟"
     )
-    await send_text(
-        update, summary, reply_markup=keyboard_with_back([[CONFIRM_TEXT]])
-    )
+    await send_text(update, summary, reply_markup=confirm_keyboard())
     return STATE_EDIT_CONFIRM
 
 
@@ -499,7 +530,7 @@ async def edit_row_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     text = (update.message.text or "").strip()
     if text == BACK_TEXT:
         return await edit_row_cancel(update, context)
-    if text != CONFIRM_TEXT:
+    if text not in (CONFIRM_TEXT, STAGE_CHANGE_TEXT):
         await send_text(update, "برای ادامه روی تایید بزنید یا برگشت کنید.")
         return STATE_EDIT_CONFIRM
     original = context.user_data.get("edit_original")
@@ -508,13 +539,16 @@ async def edit_row_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await send_text(update, "اطلاعات کافی نیست.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
-    template_path = ensure_warehouse_template_path(context.user_data["warehouse"])
+    if text == STAGE_CHANGE_TEXT:
+        change = {"action": "edit", "target": original, "values": dict(new_vals)}
+        return await stage_change(update, context, change)
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
     if not template_path:
         await send_text(update, "?????? ???? ???.")
         context.user_data["conversation_active"] = False
         return ConversationHandler.END
     try:
-        updated = update_template_row(original, new_vals, template_path)
+        updated = await update_template_row(original, new_vals, template_path)
     except Exception:
         logging.exception("Failed to update template row.")
         await send_text(update, "ویرایش انجام نشد. دوباره تلاش کنید.")
@@ -538,6 +572,187 @@ async def edit_row_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     return ConversationHandler.END
 
 
+async def review_changes_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if not context.user_data.get("warehouse"):
+        await send_text(update, "اول انبار را انتخاب کنید.", reply_markup=main_keyboard())
+        context.user_data["menu_level"] = "main"
+        return ConversationHandler.END
+    changes = pending_changes(context)
+    if not changes:
+        await send_text(
+            update, "تغییری در انتظار ثبت نیست.", reply_markup=manage_rows_keyboard()
+        )
+        context.user_data["menu_level"] = "manage_rows"
+        return ConversationHandler.END
+    context.user_data["conversation_active"] = True
+    lines = [f"{index}. {describe_change(change)}" for index, change in enumerate(changes, 1)]
+    await send_text(
+        update,
+        "تغییرات در انتظار ثبت:\n" + "\n".join(lines),
+        reply_markup=keyboard_with_back([[COMMIT_CHANGES_TEXT], [DISCARD_CHANGES_TEXT]]),
+    )
+    return STATE_REVIEW
+
+
+async def review_changes_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = (update.message.text or "").strip()
+    if text == BACK_TEXT:
+        return await review_changes_cancel(update, context)
+    if text == DISCARD_CHANGES_TEXT:
+        pending_changes(context).clear()
+        await send_text(update, "لیست تغییرات حذف شد.", reply_markup=manage_rows_keyboard())
+        context.user_data["menu_level"] = "manage_rows"
+        context.user_data["conversation_active"] = False
+        return ConversationHandler.END
+    if text != COMMIT_CHANGES_TEXT:
+        await send_text(update, "یکی از گزینه‌ها را انتخاب کنید.")
+        return STATE_REVIEW
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
+    if not template_path:
+        await send_text(update, "تمپلیت پیدا نشد.", reply_markup=manage_rows_keyboard())
+        context.user_data["conversation_active"] = False
+        return ConversationHandler.END
+    changes = pending_changes(context)
+    try:
+        applied = await apply_template_changes(list(changes), template_path)
+    except Exception:
+        logging.exception("Failed to apply template changes.")
+        await send_text(update, "ثبت تغییرات انجام نشد. دوباره تلاش کنید.")
+        context.user_data["conversation_active"] = False
+        return ConversationHandler.END
+    changes.clear()
+    context.user_data["conversation_active"] = False
+    note = f"{sum(applied)} تغییر ثبت شد."
+    skipped = len(applied) - sum(applied)
+    if skipped:
+        note = f"{note}\n{skipped} مورد پیدا نشد."
+    if any(applied):
+        await regenerate_output(update, context, note)
+    else:
+        await send_text(update, note, reply_markup=manage_rows_keyboard())
+        context.user_data["menu_level"] = "manage_rows"
+    return ConversationHandler.END
+
+
+async def review_changes_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await send_text(update, "لغو شد.", reply_markup=manage_rows_keyboard())
+    context.user_data["menu_level"] = "manage_rows"
+    context.user_data["skip_back_once"] = True
+    context.user_data["conversation_active"] = False
+    return ConversationHandler.END
+
+
+async def import_rows_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if not context.user_data.get("warehouse"):
+        await send_text(update, "اول انبار را انتخاب کنید.", reply_markup=main_keyboard())
+        context.user_data["menu_level"] = "main"
+        return ConversationHandler.END
+    context.user_data["conversation_active"] = True
+    context.user_data.pop("import_rows", None)
+    await send_text(
+        update,
+        "فایل .xlsx یا .csv طرح‌ها را ارسال کنید.\n"
+        "ستون‌ها به ترتیب: کد کالا، نام طرح، سایز، مقدار تقسیم پالت.\n"
+        "طرح‌هایی که کدشان در تمپلیت هست بروزرسانی و بقیه اضافه می‌شوند.",
+        reply_markup=keyboard_with_back([]),
+    )
+    return STATE_IMPORT_FILE
+
+
+async def import_rows_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if not update.message or not update.message.document:
+        text = (update.message.text or "").strip() if update.message else ""
+        if text == BACK_TEXT:
+            return await import_rows_cancel(update, context)
+        await send_text(update, "فایل .xlsx یا .csv ارسال کنید یا برگشت بزنید.")
+        return STATE_IMPORT_FILE
+    document = update.message.document
+    filename = document.file_name or ""
+    if not filename.lower().endswith((".xlsx", ".csv")):
+        await send_text(update, "فایل باید .xlsx یا .csv باشد.")
+        return STATE_IMPORT_FILE
+    try:
+        file_obj = await document.get_file()
+        data = await file_obj.download_as_bytearray()
+        rows, errors = await read_import_rows(bytes(data), filename)
+    except (TimedOut, NetworkError):
+        logging.exception("Telegram API request failed while downloading import file.")
+        await send_text(update, "مشکل شبکه. دوباره تلاش کنید.")
+        return STATE_IMPORT_FILE
+    except Exception:
+        logging.exception("Failed to read import file.")
+        await send_text(update, "فایل قابل خواندن نیست. فایل دیگری ارسال کنید.")
+        return STATE_IMPORT_FILE
+    if errors:
+        lines = errors[:MAX_IMPORT_ERRORS]
+        if len(errors) > MAX_IMPORT_ERRORS:
+            lines.append(f"و {len(errors) - MAX_IMPORT_ERRORS} خطای دیگر.")
+        await send_text(
+            update,
+            "فایل خطا دارد و وارد نشد:\n"
+            + "\n".join(lines)
+            + "\nفایل اصلاح‌شده را ارسال کنید.",
+        )
+        return STATE_IMPORT_FILE
+    if not rows:
+        await send_text(update, "ردیفی در فایل پیدا نشد.")
+        return STATE_IMPORT_FILE
+    context.user_data["import_rows"] = rows
+    await send_text(
+        update,
+        f"{len(rows)} ردیف خوانده شد. تایید می‌کنید؟",
+        reply_markup=keyboard_with_back([[CONFIRM_TEXT]]),
+    )
+    return STATE_IMPORT_CONFIRM
+
+
+async def import_rows_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = (update.message.text or "").strip()
+    if text == BACK_TEXT:
+        return await import_rows_cancel(update, context)
+    if text != CONFIRM_TEXT:
+        await send_text(update, "برای ادامه روی تایید بزنید یا برگشت کنید.")
+        return STATE_IMPORT_CONFIRM
+    rows = context.user_data.pop("import_rows", [])
+    template_path = await ensure_warehouse_template_path(context.user_data["warehouse"])
+    if not template_path:
+        await send_text(update, "تمپلیت پیدا نشد.", reply_markup=manage_rows_keyboard())
+        context.user_data["conversation_active"] = False
+        return ConversationHandler.END
+    try:
+        added, updated, unchanged = await upsert_template_rows(
+            rows, template_path
+        )
+    except Exception:
+        logging.exception("Failed to import template rows.")
+        await send_text(
+            update,
+            "ورود گروهی انجام نشد. دوباره تلاش کنید.",
+            reply_markup=manage_rows_keyboard(),
+        )
+        context.user_data["conversation_active"] = False
+        return ConversationHandler.END
+    context.user_data["conversation_active"] = False
+    note = f"{added} طرح اضافه و {updated} طرح بروزرسانی شد."
+    if unchanged:
+        note = f"{note}\n{unchanged} طرح بدون تغییر بود."
+    if added or updated:
+        await regenerate_output(update, context, note)
+    else:
+        await send_text(update, note, reply_markup=manage_rows_keyboard())
+        context.user_data["menu_level"] = "manage_rows"
+    return ConversationHandler.END
+
+
+async def import_rows_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    context.user_data.pop("import_rows", None)
+    await send_text(update, "لغو شد.", reply_markup=manage_rows_keyboard())
+    context.user_data["menu_level"] = "manage_rows"
+    context.user_data["skip_back_once"] = True
+    context.user_data["conversation_active"] = False
+    return ConversationHandler.END
+
+
 def build_add_row_handler() -> ConversationHandler:
     return ConversationHandler(
         entry_points=[MessageHandler(filters.Regex(f"^{ADD_ROW_TEXT}$"), add_row_start)],
@@ -566,7 +781,8 @@ def build_delete_row_handler() -> ConversationHandler:
         ],
         states={
             STATE_DEL_LIST: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, delete_row_list)
+                MessageHandler(filters.TEXT & ~filters.COMMAND, delete_row_list),
+                CallbackQueryHandler(delete_row_pick, pattern=row_page_pattern(DELETE_ROWS)),
             ],
             STATE_DEL_CONFIRM: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, delete_row_confirm)
@@ -586,7 +802,8 @@ def build_edit_row_handler() -> ConversationHandler:
         ],
         states={
             STATE_EDIT_LIST: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, edit_row_list)
+                MessageHandler(filters.TEXT & ~filters.COMMAND, edit_row_list),
+                CallbackQueryHandler(edit_row_pick, pattern=row_page_pattern(EDIT_ROWS)),
             ],
             STATE_EDIT_CODE: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, edit_row_code)
@@ -609,3 +826,43 @@ def build_edit_row_handler() -> ConversationHandler:
             CommandHandler("cancel", edit_row_cancel),
         ],
     )
+
+
+def build_review_changes_handler() -> ConversationHandler:
+    return ConversationHandler(
+        entry_points=[
+            MessageHandler(filters.Regex(f"^{REVIEW_CHANGES_TEXT}$"), review_changes_start)
+        ],
+        states={
+            STATE_REVIEW: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, review_changes_action)
+            ],
+        },
+        fallbacks=[
+            MessageHandler(filters.Regex(f"^{BACK_TEXT}$"), review_changes_cancel),
+            CommandHandler("cancel", review_changes_cancel),
+        ],
+    )
+
+
+def build_import_rows_handler() -> ConversationHandler:
+    return ConversationHandler(
+        entry_points=[
+            MessageHandler(filters.Regex(f"^{IMPORT_ROWS_TEXT}$"), import_rows_start)
+        ],
+        states={
+            STATE_IMPORT_FILE: [
+                MessageHandler(
+                    (filters.TEXT & ~filters.COMMAND) | filters.Document.ALL,
+                    import_rows_file,
+                )
+            ],
+            STATE_IMPORT_CONFIRM: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, import_rows_confirm)
+            ],
+        },
+        fallbacks=[
+            MessageHandler(filters.Regex(f"^{BACK_TEXT}$"), import_rows_cancel),
+            CommandHandler("cancel", import_rows_cancel),
+        ],
+    )
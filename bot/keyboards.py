@@ -9,11 +9,13 @@ from .strings import (
     DELETE_ROW_TEXT,
     DETAILS_TEXT,
     EDIT_ROW_TEXT,
+    IMPORT_ROWS_TEXT,
     MANAGE_MENU_TEXT,
     MANAGE_ROWS_TEXT,
     PRODUCTS_DOWNLOAD_TEXT,
     PRODUCTS_MENU_TEXT,
     PRODUCTS_UPLOAD_TEXT,
+    REVIEW_CHANGES_TEXT,
     WAREHOUSE_DARIN_TEXT,
     WAREHOUSE_FAKHAR_TEXT,
 )
@@ -29,6 +31,8 @@ def manage_rows_keyboard() -> ReplyKeyboardMarkup:
             [ADD_ROW_TEXT], 
             [EDIT_ROW_TEXT], 
             [DELETE_ROW_TEXT],
+            [REVIEW_CHANGES_TEXT],
+            [IMPORT_ROWS_TEXT],
             [BACK_TEXT], 
             ],
         resize_keyboard=True,
@@ -0,0 +1,157 @@
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def _sidecar_path(path: Path, suffix: str) -> Path:
+    return path.with_name(f".{path.name}.{suffix}")
+
+
+def _lock_file(path: Path):
+    handle = open(_sidecar_path(path, "lock"), "a+b")
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    except BaseException:
+        handle.close()
+        raise
+    return handle
+
+
+def _unlock_file(handle) -> None:
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        handle.close()
+
+
+@contextmanager
+def file_lock(path: Path):
+    # Advisory and exclusive across processes sharing the data directory.
+    # flock also conflicts between descriptors of one process, so threads
+    # are serialized too.
+    handle = _lock_file(path)
+    try:
+        yield
+    finally:
+        _unlock_file(handle)
+
+
+def read_version(path: Path) -> int:
+    try:
+        return int(_sidecar_path(path, "version").read_text() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_version(path: Path) -> int:
+    # Call with the file lock for path held.
+    version = read_version(path) + 1
+    version_path = _sidecar_path(path, "version")
+    tmp_path = _sidecar_path(path, f"version.{os.getpid()}.tmp")
+    tmp_path.write_text(str(version))
+    os.replace(tmp_path, version_path)
+    return version
+
+
+class RWLock:
+    # Writer-preferring and not reentrant. Only threads take it: handlers
+    # reach storage through async_storage, so lock waits happen on the
+    # storage pool rather than the event loop. With a path, writers also
+    # hold file_lock(path) so other processes are excluded as well.
+
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path
+        self._file = None
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def _can_read(self) -> bool:
+        return not self._writer and not self._waiting_writers
+
+    def _can_write(self) -> bool:
+        return not self._writer and not self._readers
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            while not self._can_read():
+                self._cond.wait()
+            self._readers += 1
+
+    def try_acquire_read(self) -> bool:
+        with self._cond:
+            if not self._can_read():
+                return False
+            self._readers += 1
+            return True
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while not self._can_write():
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        self._acquire_file()
+
+    def _acquire_file(self) -> None:
+        if self._path is None:
+            return
+        try:
+            self._file = _lock_file(self._path)
+        except BaseException:
+            self._release_writer()
+            raise
+
+    def release_write(self) -> None:
+        handle, self._file = self._file, None
+        try:
+            if handle is not None:
+                _unlock_file(handle)
+        finally:
+            self._release_writer()
+
+    def _release_writer(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+_TEMPLATE_LOCKS: dict[Path, RWLock] = {}
+_TEMPLATE_LOCKS_GUARD = threading.Lock()
+
+
+def template_lock(template_path: Path) -> RWLock:
+    key = Path(template_path).resolve()
+    with _TEMPLATE_LOCKS_GUARD:
+        lock = _TEMPLATE_LOCKS.get(key)
+        if lock is None:
+            lock = _TEMPLATE_LOCKS[key] = RWLock(key)
+    return lock
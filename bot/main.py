@@ -1,11 +1,22 @@
 import logging
+from warnings import filterwarnings
 
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+from telegram.ext import (
+    ApplicationBuilder,
+    CallbackQueryHandler,
+    CommandHandler,
+    InlineQueryHandler,
+    MessageHandler,
+    filters,
+)
 from telegram.request import HTTPXRequest
+from telegram.warnings import PTBUserWarning
 
+from .compaction import start_journal_compactor, stop_journal_compactor
 from .config import (
     BOT_TOKEN,
+    CONCURRENT_UPDATES,
     CONNECT_TIMEOUT,
     POOL_TIMEOUT,
     PROXY_URL,
@@ -17,6 +28,7 @@ from .config import (
 from .handlers.catalogs import build_catalog_handler
 from .handlers.details import build_details_handler
 from .handlers.documents import handle_document
+from .handlers.inline import inline_lookup
 from .handlers.menu import (
     back_to_menu,
     error_handler,
@@ -31,7 +43,10 @@ from .handlers.rows import (
     build_add_row_handler,
     build_delete_row_handler,
     build_edit_row_handler,
+    build_import_rows_handler,
+    build_review_changes_handler,
 )
+from .row_pages import expired_row_page
 from .strings import (
     MANAGE_MENU_TEXT,
     MANAGE_ROWS_TEXT,
@@ -39,12 +54,16 @@ from .strings import (
     WAREHOUSE_FAKHAR_TEXT,
     BACK_TEXT,
 )
+from .updates import OrderedUpdateProcessor
 
 
 def main() -> None:
     if not BOT_TOKEN:
         raise RuntimeError("BOT_TOKEN environment variable is required.")
     logging.basicConfig(level=logging.INFO)
+    # Design lists are picked with inline buttons inside the conversations;
+    # per-chat conversation state is what those handlers rely on.
+    filterwarnings(action="ignore", message=r".*CallbackQueryHandler", category=PTBUserWarning)
     request = HTTPXRequest(
         connection_pool_size=REQUEST_POOL_SIZE,
         connect_timeout=CONNECT_TIMEOUT,
@@ -61,13 +80,17 @@ def main() -> None:
         pool_timeout=POOL_TIMEOUT,
         proxy=PROXY_URL or None,
     )
-    app = (
+    builder = (
         ApplicationBuilder()
         .token(BOT_TOKEN)
         .request(request)
         .get_updates_request(updates_request)
-        .build()
+        .post_init(start_journal_compactor)
+        .post_shutdown(stop_journal_compactor)
     )
+    if CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(OrderedUpdateProcessor(CONCURRENT_UPDATES))
+    app = builder.build()
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(
@@ -83,10 +106,16 @@ def main() -> None:
     app.add_handler(build_add_row_handler())
     app.add_handler(build_edit_row_handler())
     app.add_handler(build_delete_row_handler())
+    app.add_handler(build_review_changes_handler())
+    app.add_handler(build_import_rows_handler())
     app.add_handler(build_details_handler())
     app.add_handler(build_catalog_handler())
     app.add_handler(build_products_handler())
-    app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
+    # handle_document reads user_data only before its first await, so a long
+    # build can leave the user's update order; admission limits bound it.
+    app.add_handler(MessageHandler(filters.Document.ALL, handle_document, block=False))
+    app.add_handler(CallbackQueryHandler(expired_row_page))
+    app.add_handler(InlineQueryHandler(inline_lookup))
     app.add_error_handler(error_handler)
     app.add_handler(MessageHandler(filters.Regex(f"^{BACK_TEXT}$"), back_to_menu), group=1)
     app.run_polling(allowed_updates=Update.ALL_TYPES)
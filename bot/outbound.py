@@ -0,0 +1,236 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import random
+import time
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from .config import (
+    CHAT_MESSAGE_BURST,
+    CHAT_MESSAGE_RATE,
+    GLOBAL_MESSAGE_RATE,
+    SEND_RETRIES,
+)
+
+INTERACTIVE = 0
+BULK = 1
+
+_BACKOFF_SECONDS = 0.5
+_STATS_INTERVAL = 60.0
+_EVICT_INTERVAL = 60.0
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, reserve: float = 0.0) -> float:
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        needed = 1 + reserve - self.tokens
+        return max(0.0, needed / self.rate)
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = 0.0
+
+
+# Sends waiting for a token, ordered by (priority, arrival). Interactive
+# replies sort ahead of bulk report messages, and bulk messages also leave
+# one token of a chat's burst in reserve so a reply never waits behind them.
+_PENDING: list[dict] = []
+_SEQUENCE = itertools.count()
+_GLOBAL = _TokenBucket(GLOBAL_MESSAGE_RATE, GLOBAL_MESSAGE_RATE)
+_CHATS: dict[int, _TokenBucket] = {}
+_SENDING: set[asyncio.Task] = set()
+_WAKE: asyncio.Event | None = None
+_DISPATCHER: asyncio.Task | None = None
+_EVICTED_AT = 0.0
+_STATS = {
+    "sent": 0,
+    "retries": 0,
+    "failed": 0,
+    "max_depth": 0,
+    "latency_total": 0.0,
+    "latency_max": 0.0,
+    "logged_at": 0.0,
+}
+
+
+def _chat_bucket(chat_id: int) -> _TokenBucket:
+    bucket = _CHATS.get(chat_id)
+    if bucket is None:
+        bucket = _TokenBucket(CHAT_MESSAGE_RATE, max(1.0, CHAT_MESSAGE_BURST))
+        _CHATS[chat_id] = bucket
+    return bucket
+
+
+def _evict_idle_chats(now: float) -> None:
+    # A full, unblocked bucket behaves exactly like a new one, so it can go.
+    global _EVICTED_AT
+    if now - _EVICTED_AT < _EVICT_INTERVAL:
+        return
+    _EVICTED_AT = now
+    waiting = {job["chat_id"] for job in _PENDING}
+    for chat_id in [chat_id for chat_id, bucket in _CHATS.items() if bucket.idle(now)]:
+        if chat_id not in waiting:
+            del _CHATS[chat_id]
+
+
+def outbound_stats() -> dict:
+    sent = _STATS["sent"]
+    return {
+        "depth": len(_PENDING),
+        "max_depth": _STATS["max_depth"],
+        "sent": sent,
+        "retries": _STATS["retries"],
+        "failed": _STATS["failed"],
+        "latency_avg": _STATS["latency_total"] / sent if sent else 0.0,
+        "latency_max": _STATS["latency_max"],
+    }
+
+
+def _enqueue(job: dict) -> None:
+    bisect.insort(_PENDING, job, key=lambda item: item["order"])
+    _STATS["max_depth"] = max(_STATS["max_depth"], len(_PENDING))
+    _WAKE.set()
+
+
+def _next_ready(now: float) -> tuple[dict | None, float | None]:
+    wait = None
+    global_wait = _GLOBAL.wait_time(now)
+    for job in _PENDING:
+        if job["future"].done():
+            return job, None
+        bucket = _chat_bucket(job["chat_id"])
+        # A burst below 2 leaves nothing to hold back.
+        reserve = min(1.0, bucket.capacity - 1) if job["order"][0] == BULK else 0.0
+        job_wait = max(
+            job["not_before"] - now,
+            bucket.wait_time(now, reserve),
+            global_wait,
+        )
+        if job_wait <= 0:
+            return job, None
+        wait = job_wait if wait is None else min(wait, job_wait)
+    return None, wait
+
+
+async def _dispatch() -> None:
+    while True:
+        now = time.monotonic()
+        _evict_idle_chats(now)
+        job, wait = _next_ready(now)
+        if job is None:
+            _WAKE.clear()
+            try:
+                await asyncio.wait_for(_WAKE.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        _PENDING.remove(job)
+        if job["future"].done():
+            # The caller was cancelled while the job waited.
+            continue
+        _GLOBAL.take(now)
+        _chat_bucket(job["chat_id"]).take(now)
+        task = asyncio.create_task(_send(job))
+        _SENDING.add(task)
+        task.add_done_callback(_SENDING.discard)
+
+
+def _finish(job: dict, result=None, error: BaseException | None = None) -> None:
+    future = job["future"]
+    if future.done():
+        return
+    if error is not None:
+        _STATS["failed"] += 1
+        future.set_exception(error)
+        return
+    now = time.monotonic()
+    latency = now - job["enqueued"]
+    _STATS["sent"] += 1
+    _STATS["latency_total"] += latency
+    _STATS["latency_max"] = max(_STATS["latency_max"], latency)
+    if now - _STATS["logged_at"] >= _STATS_INTERVAL:
+        _STATS["logged_at"] = now
+        logging.info("Outbound messages: %s", outbound_stats())
+    future.set_result(result)
+
+
+def _retry(job: dict, delay: float) -> None:
+    _STATS["retries"] += 1
+    job["not_before"] = time.monotonic() + delay
+    _enqueue(job)
+
+
+async def _send(job: dict) -> None:
+    try:
+        result = await job["call"]()
+    except RetryAfter as exc:
+        delay = float(exc.retry_after)
+        _chat_bucket(job["chat_id"]).block(time.monotonic() + delay)
+        if job["flood_waits"] >= SEND_RETRIES:
+            _finish(job, error=exc)
+            return
+        job["flood_waits"] += 1
+        logging.warning("Flood control for chat %s; waiting %ss.", job["chat_id"], delay)
+        _retry(job, delay)
+    except BadRequest as exc:
+        _finish(job, error=exc)
+    except NetworkError as exc:
+        if job["attempt"] >= SEND_RETRIES:
+            _finish(job, error=exc)
+            return
+        job["attempt"] += 1
+        delay = _BACKOFF_SECONDS * 2 ** job["attempt"] * random.uniform(0.5, 1.5)
+        logging.warning("Send to chat %s failed (%s); retrying in %.1fs.", job["chat_id"], exc, delay)
+        _retry(job, delay)
+    except Exception as exc:
+        _finish(job, error=exc)
+    else:
+        _finish(job, result)
+
+
+def _ensure_dispatcher() -> None:
+    global _DISPATCHER, _WAKE
+    if _DISPATCHER is None or _DISPATCHER.done():
+        _WAKE = asyncio.Event()
+        _DISPATCHER = asyncio.create_task(_dispatch())
+
+
+async def deliver(chat_id: int, call, priority: int = INTERACTIVE):
+    # call is a zero-argument coroutine function performing one Bot API send;
+    # it may run more than once when the send is retried.
+    _ensure_dispatcher()
+    job = {
+        "order": (priority, next(_SEQUENCE)),
+        "chat_id": chat_id,
+        "call": call,
+        "attempt": 0,
+        "flood_waits": 0,
+        "not_before": 0.0,
+        "enqueued": time.monotonic(),
+        "future": asyncio.get_running_loop().create_future(),
+    }
+    _enqueue(job)
+    return await job["future"]
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import multiprocessing
+
+from .config import PROCESS_TIMEOUT, PROCESS_WORKERS
+
+# Spawned rather than forked: the bot process runs threads, and forking a
+# process that holds a lock in another thread can deadlock the child.
+_CONTEXT = multiprocessing.get_context("spawn")
+_IDLE: asyncio.Queue | None = None
+
+
+def _worker_main(conn) -> None:
+    while True:
+        try:
+            func, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            result = (True, func(*args))
+        except Exception as exc:
+            result = (False, exc)
+        try:
+            conn.send(result)
+        except Exception:
+            conn.send((False, RuntimeError(repr(result[1]))))
+
+
+class _Worker:
+    def __init__(self) -> None:
+        self.conn, child_conn = _CONTEXT.Pipe()
+        self.process = _CONTEXT.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.killed = False
+
+    def call(self, func, args: tuple):
+        self.conn.send((func, args))
+        return self.conn.recv()
+
+    def kill(self) -> None:
+        # Only signals the process; close() reaps it off the event loop when
+        # the slot is next used.
+        self.process.kill()
+        self.killed = True
+
+    def close(self) -> None:
+        self.process.join()
+        self.conn.close()
+
+
+def _idle_workers() -> asyncio.Queue:
+    global _IDLE
+    if _IDLE is None:
+        _IDLE = asyncio.Queue()
+        for _ in range(max(1, PROCESS_WORKERS)):
+            _IDLE.put_nowait(None)
+    return _IDLE
+
+
+async def run_processing(func, *args):
+    # func and its arguments must be picklable (module-level functions).
+    # Waits for a free worker; on timeout the worker is killed and a fresh one
+    # replaces it on next use, so a runaway job stops burning CPU.
+    idle = _idle_workers()
+    worker = await idle.get()
+    try:
+        if worker is not None and (worker.killed or not worker.process.is_alive()):
+            await asyncio.to_thread(worker.close)
+            worker = None
+        if worker is None:
+            worker = await asyncio.to_thread(_Worker)
+        ok, value = await asyncio.wait_for(
+            asyncio.to_thread(worker.call, func, args), timeout=PROCESS_TIMEOUT
+        )
+    except BaseException:
+        if worker is not None:
+            logging.warning("Killing processing worker %s.", worker.process.pid)
+            worker.kill()
+        raise
+    finally:
+        idle.put_nowait(worker)
+    if not ok:
+        raise value
+    return value
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+
+from telegram import Bot
+from telegram.error import TelegramError
+
+from .config import (
+    ALLOWED_METRICS,
+    DEFAULT_METRIC,
+    REGENERATION_DEBOUNCE,
+    resolve_warehouse_input_path,
+    warehouse_output_path,
+)
+from .admission import release_upload
+from .async_storage import ensure_warehouse_template_path, export_template
+from .processing import run_processing
+from .storage import invalidate_output_index, write_output_file
+from .strings import WAREHOUSE_LABELS
+from .text import send_chat_text
+
+# One entry per warehouse: the task draining its queue, and the chats and
+# admitted uploads waiting for the next build. Requests that arrive while a
+# build runs all fold into that single pending build.
+_QUEUES: dict[str, dict] = {}
+
+
+def request_regeneration(
+    bot: Bot, warehouse: str, chat_id: int, job: dict | None = None
+) -> bool:
+    # Returns True when a build is already running, so this request waits
+    # for the one after it; during the debounce it simply joins the next
+    # build. job, an admitted upload, is released once a build including
+    # it ends.
+    state = _QUEUES.setdefault(
+        warehouse, {"task": None, "building": False, "chats": set(), "jobs": []}
+    )
+    state["chats"].add(chat_id)
+    if job is not None:
+        state["jobs"].append(job)
+    if state["task"] is None:
+        state["task"] = asyncio.create_task(_drain(bot, warehouse))
+    return state["building"]
+
+
+async def _drain(bot: Bot, warehouse: str) -> None:
+    state = _QUEUES[warehouse]
+    try:
+        while state["chats"]:
+            await asyncio.sleep(REGENERATION_DEBOUNCE)
+            chats, state["chats"] = state["chats"], set()
+            jobs, state["jobs"] = state["jobs"], []
+            state["building"] = True
+            try:
+                note = await _build(warehouse)
+            finally:
+                state["building"] = False
+                for job in jobs:
+                    release_upload(job)
+            label = WAREHOUSE_LABELS.get(warehouse, warehouse)
+            for chat_id in chats:
+                try:
+                    await send_chat_text(bot, chat_id, f"{label}: {note}")
+                except TelegramError:
+                    logging.exception("Failed to notify chat %s about regeneration.", chat_id)
+    finally:
+        state["task"] = None
+        for job in state["jobs"]:
+            release_upload(job)
+        state["jobs"] = []
+
+
+async def _build(warehouse: str) -> str:
+    input_path = resolve_warehouse_input_path(warehouse)
+    template_path = await ensure_warehouse_template_path(warehouse)
+    if not input_path:
+        return "برای بروزرسانی خروجی، فایل محصولات را ارسال کنید."
+    if not template_path:
+        return "تمپلیت پیدا نشد."
+    metric = DEFAULT_METRIC if DEFAULT_METRIC in ALLOWED_METRICS else "physical"
+    output_path = warehouse_output_path(warehouse)
+    try:
+        await export_template(template_path)
+        await run_processing(
+            write_output_file, input_path, template_path, output_path, metric
+        )
+    except asyncio.TimeoutError:
+        logging.error("Timeout while regenerating output for %s.", warehouse)
+        return "زمان ساخت خروجی تمام شد و ساخت متوقف شد."
+    except Exception:
+        logging.exception("Failed to regenerate output for %s.", warehouse)
+        return "بروزرسانی خروجی انجام نشد."
+    finally:
+        invalidate_output_index(output_path)
+    return "خروجی بروزرسانی شد."
@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from pathlib import Path
+
+from .config import RESULT_CACHE_SIZE
+
+# Telegram file_ids of recently sent outputs, keyed by the upload (its
+# file_unique_id and its content digest) and the template version and metric
+# the output was built against, so a resent file is answered without being
+# downloaded, built or uploaded again.
+_RESULTS: OrderedDict[tuple, str] = OrderedDict()
+
+
+def _key(template_path: Path, version: int, metric: str, source: str) -> tuple:
+    return str(template_path), version, metric, source
+
+
+def cached_result(
+    template_path: Path, version: int, metric: str, sources: list[str]
+) -> str | None:
+    for source in sources:
+        key = _key(template_path, version, metric, source)
+        file_id = _RESULTS.get(key)
+        if file_id is not None:
+            _RESULTS.move_to_end(key)
+            return file_id
+    return None
+
+
+def store_result(
+    template_path: Path, version: int, metric: str, sources: list[str], file_id: str
+) -> None:
+    for source in sources:
+        _RESULTS[_key(template_path, version, metric, source)] = file_id
+    # Each upload is stored under two keys.
+    while len(_RESULTS) > max(0, RESULT_CACHE_SIZE) * 2:
+        _RESULTS.popitem(last=False)
+
+
+def forget_result(file_id: str) -> None:
+    for key in [key for key, value in _RESULTS.items() if value == file_id]:
+        del _RESULTS[key]
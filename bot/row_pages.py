@@ -0,0 +1,119 @@
+import logging
+import math
+import zlib
+from pathlib import Path
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+
+from .async_storage import find_template_matches_any, list_template_rows
+from .config import ROW_PAGE_SIZE, SEARCH_RESULT_LIMIT
+from .formatting import row_label
+from .outbound import deliver
+from .text import rtl, send_text
+
+# Design lists are sent as inline keyboards, one page at a time. Only the
+# flow's search query is kept in user_data: a page is sliced from the cached
+# template rows (or the cached search index) when it is shown. A row button
+# carries the row number and a short tag of its code and name, so a pick made
+# after the template changed is refused instead of acting on another row.
+
+
+def _row_tag(row: dict) -> str:
+    source = f"{row.get('code_display', '')}\x1f{row.get('name_display', '')}"
+    return format(zlib.crc32(source.encode("utf-8")), "08x")
+
+
+def row_page_pattern(flow: str) -> str:
+    return rf"^{flow}:(n|p:\d+|r:\d+:\d+:[0-9a-f]{{8}})$"
+
+
+async def _list_rows(template_path: Path, query: str | None) -> list[dict]:
+    if query is None:
+        return await list_template_rows(template_path)
+    return await find_template_matches_any(query, template_path, SEARCH_RESULT_LIMIT)
+
+
+def _page_view(flow: str, rows: list[dict], page: int) -> tuple[str, InlineKeyboardMarkup]:
+    page_size = max(1, ROW_PAGE_SIZE)
+    pages = max(1, math.ceil(len(rows) / page_size))
+    page = min(max(page, 0), pages - 1)
+    start = page * page_size
+    buttons = [
+        [
+            InlineKeyboardButton(
+                row_label(row),
+                callback_data=f"{flow}:r:{page}:{row['row']}:{_row_tag(row)}",
+            )
+        ]
+        for row in rows[start : start + page_size]
+    ]
+    if pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("« قبلی", callback_data=f"{flow}:p:{page - 1}"))
+        nav.append(InlineKeyboardButton(f"{page + 1} / {pages}", callback_data=f"{flow}:n"))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton("بعدی »", callback_data=f"{flow}:p:{page + 1}"))
+        buttons.append(nav)
+    text = f"{len(rows)} طرح - صفحه {page + 1} از {pages}"
+    return text, InlineKeyboardMarkup(buttons)
+
+
+async def send_row_page(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    flow: str,
+    rows: list[dict],
+    query: str | None = None,
+) -> None:
+    context.user_data.setdefault("row_queries", {})[flow] = query
+    if not rows:
+        await send_text(update, "طرحی برای انتخاب وجود ندارد.")
+        return
+    text, markup = _page_view(flow, rows, 0)
+    await send_text(update, text, reply_markup=markup)
+
+
+async def row_page_callback(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    flow: str,
+    template_path: Path,
+) -> dict | None:
+    # Returns the picked row, or None after turning the page or refusing a
+    # stale pick.
+    callback = update.callback_query
+    parts = callback.data.split(":")
+    if parts[1] == "n":
+        await callback.answer()
+        return None
+    if parts[1] == "r":
+        rows = await list_template_rows(template_path)
+        target = next(
+            (row for row in rows if str(row["row"]) == parts[3] and _row_tag(row) == parts[4]),
+            None,
+        )
+        if target is not None:
+            await callback.answer()
+            return target
+        await callback.answer("این طرح تغییر کرده است. فهرست به‌روز شد.")
+    else:
+        await callback.answer()
+    if callback.message is None:
+        return None
+    rows = await _list_rows(template_path, context.user_data.get("row_queries", {}).get(flow))
+    text, markup = _page_view(flow, rows, int(parts[2]))
+    try:
+        await deliver(
+            callback.message.chat_id,
+            lambda: callback.edit_message_text(rtl(text), reply_markup=markup),
+        )
+    except BadRequest as exc:
+        logging.debug("Row page was not updated: %s", exc)
+    return None
+
+
+async def expired_row_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.callback_query.answer("این فهرست دیگر فعال نیست.")
@@ -2,9 +2,25 @@ from pathlib import Path
 
 import openpyxl
 
-from .config import TEMPLATE_LOCK, TEMPLATE_PATH
+from build_output import process_files, save_workbook_atomic
+
+from . import template_db, template_journal
+from .config import (
+    JOURNAL_COMPACT_BYTES,
+    JOURNAL_QUIET_SECONDS,
+    TEMPLATE_BACKEND,
+    TEMPLATE_JOURNAL,
+    TEMPLATE_PATH,
+)
+from .locks import bump_version, file_lock, read_version, template_lock
 from .utils import clean_text, normalize_code_value, normalize_query
 
+_TEMPLATE_ROWS_CACHE: dict[Path, tuple[tuple, list[dict]]] = {}
+_OUTPUT_INDEX: dict[Path, tuple] = {}
+_SEARCH_INDEX: dict[Path, tuple[tuple, dict]] = {}
+_TEMPLATE_LAST_ROW: dict[Path, tuple[tuple, int]] = {}
+_PREFIX_LEN = 3
+
 
 def resolve_template_path(template_path: Path | None) -> Path:
     if template_path is None:
@@ -12,80 +28,433 @@ def resolve_template_path(template_path: Path | None) -> Path:
     return template_path
 
 
+def _file_stamp(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _build_row(r: int, code_raw, name_raw, size_raw, divisor_raw) -> dict | None:
+    code_display = normalize_code_value(code_raw)
+    name_display = clean_text(name_raw)
+    if not code_display and not name_display:
+        return None
+    return {
+        "row": r,
+        "code_raw": code_raw,
+        "name_raw": name_raw,
+        "size_raw": size_raw,
+        "divisor_raw": divisor_raw,
+        "code_display": code_display,
+        "name_display": name_display,
+        "size_display": clean_text(size_raw),
+        "divisor_display": normalize_code_value(divisor_raw),
+    }
+
+
+def _read_template_rows(template_path: Path) -> list[dict]:
+    rows: list[dict] = []
+    if _use_template_db():
+        for values in template_db.fetch_rows(template_db.connect(template_path)):
+            row = _build_row(*values)
+            if row is not None:
+                rows.append(row)
+        return rows
+    wb = openpyxl.load_workbook(template_path)
+    try:
+        ws = wb.active
+        for r, values in enumerate(
+            ws.iter_rows(min_row=2, max_col=4, values_only=True), start=2
+        ):
+            row = _build_row(r, *values)
+            if row is not None:
+                rows.append(row)
+        identifier = wb.properties.identifier
+    finally:
+        wb.close()
+    if _use_template_journal():
+        rows = _rows_after_entries(
+            rows, template_journal.pending_entries(template_path, identifier)
+        )
+    return rows
+
+
+def _rows_after_append(rows: list[dict], new_row: dict | None) -> list[dict]:
+    if new_row is None:
+        return rows
+    return [*rows, new_row]
+
+
+def _rows_after_update(rows: list[dict], row_index: int, new_row: dict | None) -> list[dict]:
+    updated = [row for row in rows if row["row"] != row_index]
+    if new_row is not None:
+        updated.append(new_row)
+        updated.sort(key=lambda row: row["row"])
+    return updated
+
+
+def _rows_after_delete(rows: list[dict], row_index: int) -> list[dict]:
+    updated: list[dict] = []
+    for row in rows:
+        if row["row"] == row_index:
+            continue
+        if row["row"] > row_index:
+            row = {**row, "row": row["row"] - 1}
+        updated.append(row)
+    return updated
+
+
+def _rows_after_entries(rows: list[dict], entries: list[dict]) -> list[dict]:
+    for entry in entries:
+        if entry["action"] == "delete":
+            rows = _rows_after_delete(rows, entry["row"])
+        elif entry["action"] == "edit":
+            rows = _rows_after_update(
+                rows, entry["row"], _build_row(entry["row"], *entry["values"])
+            )
+        else:
+            rows = _rows_after_append(rows, _build_row(entry["row"], *entry["values"]))
+    return rows
+
+
+def _last_row_after_entries(last_row: int, entries: list[dict]) -> int:
+    for entry in entries:
+        if entry["action"] == "delete":
+            if entry["row"] <= last_row:
+                last_row -= 1
+        else:
+            last_row = max(last_row, entry["row"])
+    return last_row
+
+
+def _journal_last_row(template_path: Path) -> int:
+    # The last occupied sheet row once pending entries are compacted. As in
+    # _append_xlsx_row, a row is occupied when any of its first four cells has
+    # a value, even one without code and name that the parsed rows skip.
+    stamp = _template_stamp(template_path)
+    cached = _TEMPLATE_LAST_ROW.get(template_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    wb = openpyxl.load_workbook(template_path, read_only=True)
+    try:
+        last_row = 1
+        for r, values in enumerate(
+            wb.active.iter_rows(min_row=2, max_col=4, values_only=True), start=2
+        ):
+            if any(value not in (None, "") for value in values):
+                last_row = r
+        identifier = wb.properties.identifier
+    finally:
+        wb.close()
+    last_row = _last_row_after_entries(
+        last_row, template_journal.pending_entries(template_path, identifier)
+    )
+    _TEMPLATE_LAST_ROW[template_path] = (stamp, last_row)
+    return last_row
+
+
+def _use_template_db() -> bool:
+    return TEMPLATE_BACKEND == "sqlite"
+
+
+def _use_template_journal() -> bool:
+    return TEMPLATE_JOURNAL and not _use_template_db()
+
+
+def _template_stamp(template_path: Path) -> tuple:
+    if _use_template_db():
+        return ("db", template_db.db_version(template_db.connect(template_path)))
+    if _use_template_journal():
+        return (
+            _file_stamp(template_path),
+            template_journal.journal_stamp(template_path),
+            read_version(template_path),
+        )
+    return _file_stamp(template_path), read_version(template_path)
+
+
+def _load_template_rows(template_path: Path) -> tuple[tuple, list[dict]]:
+    stamp = _template_stamp(template_path)
+    cached = _TEMPLATE_ROWS_CACHE.get(template_path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, _read_template_rows(template_path))
+        _TEMPLATE_ROWS_CACHE[template_path] = cached
+    return cached
+
+
+def _record_template_write(template_path: Path, stamp_before: tuple, apply) -> None:
+    # Runs under the template write lock, file lock included, so the version
+    # bump is visible to other processes sharing the data directory.
+    bump_version(template_path)
+    cached = _TEMPLATE_ROWS_CACHE.pop(template_path, None)
+    if cached is None or cached[0] != stamp_before:
+        return
+    _TEMPLATE_ROWS_CACHE[template_path] = (
+        _template_stamp(template_path),
+        apply(cached[1]),
+    )
+
+
+def _target_keys(target: dict) -> tuple[str, str]:
+    code_norm = normalize_code_value(
+        target.get("code_raw", target.get("code_display", ""))
+    )
+    name_norm = normalize_query(
+        target.get("name_raw", target.get("name_display", ""))
+    )
+    return code_norm, name_norm
+
+
+def _find_cached_row(
+    rows: list[dict], target_row, target_code_norm: str, target_name_norm: str
+) -> int | None:
+    if isinstance(target_row, int):
+        for row in rows:
+            if row["row"] == target_row:
+                if _target_keys(row) == (target_code_norm, target_name_norm):
+                    return target_row
+                break
+    for row in rows:
+        if _target_keys(row) == (target_code_norm, target_name_norm):
+            return row["row"]
+    return None
+
+
+def _find_xlsx_row(ws, target_row, target_code_norm: str, target_name_norm: str) -> int | None:
+    if isinstance(target_row, int) and 2 <= target_row <= ws.max_row:
+        row_code = normalize_code_value(ws.cell(target_row, 1).value)
+        row_name = normalize_query(ws.cell(target_row, 2).value)
+        if row_code == target_code_norm and row_name == target_name_norm:
+            return target_row
+    for r in range(2, ws.max_row + 1):
+        row_code = normalize_code_value(ws.cell(r, 1).value)
+        row_name = normalize_query(ws.cell(r, 2).value)
+        if row_code == target_code_norm and row_name == target_name_norm:
+            return r
+    return None
+
+
+def _append_xlsx_row(template_path: Path, code, name, size, divisor) -> int:
+    wb = openpyxl.load_workbook(template_path)
+    try:
+        ws = wb.active
+        last_row = 1
+        for r in range(2, ws.max_row + 1):
+            if any(ws.cell(r, c).value not in (None, "") for c in range(1, 5)):
+                last_row = r
+        next_row = last_row + 1
+        ws.cell(next_row, 1).value = code
+        ws.cell(next_row, 2).value = name
+        ws.cell(next_row, 3).value = size
+        ws.cell(next_row, 4).value = divisor
+        save_workbook_atomic(wb, template_path)
+    finally:
+        wb.close()
+    return next_row
+
+
+def _delete_xlsx_row(
+    template_path: Path, target_row, target_code_norm: str, target_name_norm: str
+) -> int | None:
+    wb = openpyxl.load_workbook(template_path)
+    try:
+        ws = wb.active
+        row_index = _find_xlsx_row(ws, target_row, target_code_norm, target_name_norm)
+        if row_index is None:
+            return None
+        ws.delete_rows(row_index, 1)
+        save_workbook_atomic(wb, template_path)
+    finally:
+        wb.close()
+    return row_index
+
+
+def _update_xlsx_row(
+    template_path: Path,
+    target_row,
+    target_code_norm: str,
+    target_name_norm: str,
+    new_values: dict,
+) -> int | None:
+    wb = openpyxl.load_workbook(template_path)
+    try:
+        ws = wb.active
+        row_index = _find_xlsx_row(ws, target_row, target_code_norm, target_name_norm)
+        if row_index is None:
+            return None
+        ws.cell(row_index, 1).value = new_values["code"]
+        ws.cell(row_index, 2).value = new_values["name"]
+        ws.cell(row_index, 3).value = new_values["size"]
+        ws.cell(row_index, 4).value = new_values["divisor"]
+        save_workbook_atomic(wb, template_path)
+    finally:
+        wb.close()
+    return row_index
+
+
 def append_template_row(
     code: str, name: str, size: str, divisor, template_path: Path | None = None
 ) -> int:
     template_path = resolve_template_path(template_path)
     if not template_path.exists():
         raise FileNotFoundError("Template not found.")
-    with TEMPLATE_LOCK:
-        wb = openpyxl.load_workbook(template_path)
-        try:
-            ws = wb.active
-            last_row = 1
-            for r in range(2, ws.max_row + 1):
-                if any(ws.cell(r, c).value not in (None, "") for c in range(1, 5)):
-                    last_row = r
-            next_row = last_row + 1
-            ws.cell(next_row, 1).value = code
-            ws.cell(next_row, 2).value = name
-            ws.cell(next_row, 3).value = size
-            ws.cell(next_row, 4).value = divisor
-            wb.save(template_path)
-        finally:
-            wb.close()
+    with template_lock(template_path).write():
+        stamp_before = _template_stamp(template_path)
+        if _use_template_db():
+            next_row = template_db.insert_row(
+                template_db.connect(template_path), code, name, size, divisor
+            )
+        elif _use_template_journal():
+            next_row = _journal_last_row(template_path) + 1
+            template_journal.append_entries(
+                template_path,
+                [template_journal.make_entry("add", next_row, (code, name, size, divisor))],
+            )
+        else:
+            next_row = _append_xlsx_row(template_path, code, name, size, divisor)
+        new_row = _build_row(next_row, code, name, size, divisor)
+        _record_template_write(
+            template_path,
+            stamp_before,
+            lambda rows: _rows_after_append(rows, new_row),
+        )
+        if _use_template_journal():
+            _TEMPLATE_LAST_ROW[template_path] = (_template_stamp(template_path), next_row)
     return next_row
 
 
+def _cached_template_rows(template_path: Path) -> tuple[tuple, list[dict]]:
+    lock = template_lock(template_path)
+    cached = _TEMPLATE_ROWS_CACHE.get(template_path)
+    if cached is not None and not lock.try_acquire_read():
+        # A writer holds or awaits the lock: serve the last complete snapshot.
+        return cached
+    if cached is None:
+        lock.acquire_read()
+    try:
+        return _load_template_rows(template_path)
+    finally:
+        lock.release_read()
+
+
 def list_template_rows(template_path: Path | None = None) -> list[dict]:
     template_path = resolve_template_path(template_path)
     if not template_path.exists():
         raise FileNotFoundError("Template not found.")
-    rows: list[dict] = []
-    with TEMPLATE_LOCK:
-        wb = openpyxl.load_workbook(template_path)
-        try:
-            ws = wb.active
-            for r in range(2, ws.max_row + 1):
-                code_raw = ws.cell(r, 1).value
-                name_raw = ws.cell(r, 2).value
-                size_raw = ws.cell(r, 3).value
-                divisor_raw = ws.cell(r, 4).value
-                code_display = normalize_code_value(code_raw)
-                name_display = clean_text(name_raw)
-                size_display = clean_text(size_raw)
-                divisor_display = normalize_code_value(divisor_raw)
-                if not code_display and not name_display:
-                    continue
-                rows.append(
-                    {
-                        "row": r,
-                        "code_raw": code_raw,
-                        "name_raw": name_raw,
-                        "size_raw": size_raw,
-                        "divisor_raw": divisor_raw,
-                        "code_display": code_display,
-                        "name_display": name_display,
-                        "size_display": size_display,
-                        "divisor_display": divisor_display,
-                    }
-                )
-        finally:
-            wb.close()
-    return rows
+    return list(_cached_template_rows(template_path)[1])
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _add_posting(index: dict[str, list[int]], key: str, position: int) -> None:
+    postings = index.setdefault(key, [])
+    if not postings or postings[-1] != position:
+        postings.append(position)
+
+
+def _build_search_index(rows: list[dict]) -> dict:
+    entries: list[tuple[dict, str, str, tuple[str, ...]]] = []
+    code_exact: dict[str, list[int]] = {}
+    code_prefix: dict[str, list[int]] = {}
+    name_prefix: dict[str, list[int]] = {}
+    word_prefix: dict[str, list[int]] = {}
+    trigrams: dict[str, set[int]] = {}
+    for position, row in enumerate(rows):
+        code_norm = normalize_query(row["code_display"])
+        name_norm = normalize_query(row["name_display"])
+        words = tuple(name_norm.split())
+        entries.append((row, code_norm, name_norm, words))
+        _add_posting(code_exact, code_norm, position)
+        for size in range(1, _PREFIX_LEN + 1):
+            if len(code_norm) >= size:
+                _add_posting(code_prefix, code_norm[:size], position)
+            if len(name_norm) >= size:
+                _add_posting(name_prefix, name_norm[:size], position)
+            for word in words:
+                if len(word) >= size:
+                    _add_posting(word_prefix, word[:size], position)
+        for gram in _trigrams(code_norm) | _trigrams(name_norm):
+            trigrams.setdefault(gram, set()).add(position)
+    return {
+        "entries": entries,
+        "code_exact": code_exact,
+        "code_prefix": code_prefix,
+        "name_prefix": name_prefix,
+        "word_prefix": word_prefix,
+        "trigrams": trigrams,
+    }
+
 
+def _search_index(template_path: Path) -> dict:
+    stamp, rows = _cached_template_rows(template_path)
+    cached = _SEARCH_INDEX.get(template_path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, _build_search_index(rows))
+        _SEARCH_INDEX[template_path] = cached
+    return cached[1]
 
-def find_template_matches_any(query: str, template_path: Path | None = None) -> list[dict]:
-    rows = list_template_rows(template_path)
+
+def _substring_candidates(index: dict, query: str):
+    grams = _trigrams(query)
+    if not grams:
+        return range(len(index["entries"]))
+    postings = sorted((index["trigrams"].get(gram, set()) for gram in grams), key=len)
+    return sorted(set.intersection(*postings))
+
+
+def _ranked_positions(index: dict, query: str):
+    # Yields positions best match first: exact code, code prefix, name
+    # prefix, word prefix inside the name, then any substring.
+    entries = index["entries"]
+    key = query[:_PREFIX_LEN]
+    code_pool = index["code_prefix"].get(key, ())
+    name_pool = index["name_prefix"].get(key, ())
+    word_pool = index["word_prefix"].get(key, ())
+    candidates = None
+    if len(query) > _PREFIX_LEN:
+        candidates = _substring_candidates(index, query)
+        code_pool = min(code_pool, candidates, key=len)
+        name_pool = min(name_pool, candidates, key=len)
+        word_pool = min(word_pool, candidates, key=len)
+    yield from index["code_exact"].get(query, ())
+    for position in code_pool:
+        if entries[position][1].startswith(query):
+            yield position
+    for position in name_pool:
+        if entries[position][2].startswith(query):
+            yield position
+    for position in word_pool:
+        if any(word.startswith(query) for word in entries[position][3]):
+            yield position
+    if candidates is None:
+        candidates = _substring_candidates(index, query)
+    for position in candidates:
+        _, code_norm, name_norm, _ = entries[position]
+        if query in code_norm or query in name_norm:
+            yield position
+
+
+def find_template_matches_any(
+    query: str, template_path: Path | None = None, limit: int | None = None
+) -> list[dict]:
+    template_path = resolve_template_path(template_path)
+    if not template_path.exists():
+        raise FileNotFoundError("Template not found.")
+    index = _search_index(template_path)
+    entries = index["entries"]
     query_norm = normalize_query(query)
     if not query_norm:
-        return rows
+        return [entry[0] for entry in entries[:limit]]
     matches: list[dict] = []
-    for row in rows:
-        code_norm = normalize_query(row["code_display"])
-        name_norm = normalize_query(row["name_display"])
-        if query_norm in code_norm or query_norm in name_norm:
-            matches.append(row)
+    seen: set[int] = set()
+    for position in _ranked_positions(index, query_norm):
+        if position in seen:
+            continue
+        seen.add(position)
+        matches.append(entries[position][0])
+        if limit is not None and len(matches) >= limit:
+            break
     return matches
 
 
@@ -94,33 +463,47 @@ def delete_template_row(row: dict, template_path: Path | None = None) -> bool:
     if not template_path.exists():
         raise FileNotFoundError("Template not found.")
     target_row = row.get("row")
-    target_code_norm = normalize_code_value(
-        row.get("code_raw", row.get("code_display", ""))
-    )
-    target_name_norm = normalize_query(
-        row.get("name_raw", row.get("name_display", ""))
-    )
-    with TEMPLATE_LOCK:
-        wb = openpyxl.load_workbook(template_path)
-        try:
-            ws = wb.active
-            if isinstance(target_row, int) and 2 <= target_row <= ws.max_row:
-                row_code = normalize_code_value(ws.cell(target_row, 1).value)
-                row_name = normalize_query(ws.cell(target_row, 2).value)
-                if row_code == target_code_norm and row_name == target_name_norm:
-                    ws.delete_rows(target_row, 1)
-                    wb.save(template_path)
-                    return True
-            for r in range(2, ws.max_row + 1):
-                row_code = normalize_code_value(ws.cell(r, 1).value)
-                row_name = normalize_query(ws.cell(r, 2).value)
-                if row_code == target_code_norm and row_name == target_name_norm:
-                    ws.delete_rows(r, 1)
-                    wb.save(template_path)
-                    return True
-        finally:
-            wb.close()
-    return False
+    target_code_norm, target_name_norm = _target_keys(row)
+    with template_lock(template_path).write():
+        stamp_before = _template_stamp(template_path)
+        if _use_template_db():
+            conn = template_db.connect(template_path)
+            row_index = template_db.find_row_id(
+                conn, target_row, target_code_norm, target_name_norm
+            )
+            if row_index is None:
+                return False
+            template_db.delete_row(conn, row_index)
+            _record_template_write(
+                template_path,
+                stamp_before,
+                lambda rows: _rows_after_update(rows, row_index, None),
+            )
+            return True
+        if _use_template_journal():
+            row_index = _find_cached_row(
+                _load_template_rows(template_path)[1],
+                target_row,
+                target_code_norm,
+                target_name_norm,
+            )
+            if row_index is None:
+                return False
+            template_journal.append_entries(
+                template_path, [template_journal.make_entry("delete", row_index)]
+            )
+        else:
+            row_index = _delete_xlsx_row(
+                template_path, target_row, target_code_norm, target_name_norm
+            )
+            if row_index is None:
+                return False
+        _record_template_write(
+            template_path,
+            stamp_before,
+            lambda rows: _rows_after_delete(rows, row_index),
+        )
+    return True
 
 
 def update_template_row(
@@ -130,76 +513,366 @@ def update_template_row(
     if not template_path.exists():
         raise FileNotFoundError("Template not found.")
     target_row = original.get("row")
-    target_code_norm = normalize_code_value(
-        original.get("code_raw", original.get("code_display", ""))
+    target_code_norm, target_name_norm = _target_keys(original)
+    with template_lock(template_path).write():
+        stamp_before = _template_stamp(template_path)
+        if _use_template_db():
+            conn = template_db.connect(template_path)
+            row_index = template_db.find_row_id(
+                conn, target_row, target_code_norm, target_name_norm
+            )
+            if row_index is not None:
+                template_db.update_row(
+                    conn,
+                    row_index,
+                    new_values["code"],
+                    new_values["name"],
+                    new_values["size"],
+                    new_values["divisor"],
+                )
+        elif _use_template_journal():
+            row_index = _find_cached_row(
+                _load_template_rows(template_path)[1],
+                target_row,
+                target_code_norm,
+                target_name_norm,
+            )
+            if row_index is not None:
+                template_journal.append_entries(
+                    template_path,
+                    [
+                        template_journal.make_entry(
+                            "edit",
+                            row_index,
+                            (
+                                new_values["code"],
+                                new_values["name"],
+                                new_values["size"],
+                                new_values["divisor"],
+                            ),
+                        )
+                    ],
+                )
+        else:
+            row_index = _update_xlsx_row(
+                template_path,
+                target_row,
+                target_code_norm,
+                target_name_norm,
+                new_values,
+            )
+        if row_index is None:
+            return False
+        new_row = _build_row(
+            row_index,
+            new_values["code"],
+            new_values["name"],
+            new_values["size"],
+            new_values["divisor"],
+        )
+        _record_template_write(
+            template_path,
+            stamp_before,
+            lambda rows: _rows_after_update(rows, row_index, new_row),
+        )
+    return True
+
+
+def _change_values(change: dict) -> tuple:
+    values = change["values"]
+    return values["code"], values["name"], values["size"], values["divisor"]
+
+
+def _apply_xlsx_changes(template_path: Path, changes: list[dict]) -> list[bool]:
+    wb = openpyxl.load_workbook(template_path)
+    try:
+        ws = wb.active
+        targets: list[int | None] = []
+        for change in changes:
+            if change["action"] == "add":
+                targets.append(None)
+                continue
+            code_norm, name_norm = _target_keys(change["target"])
+            targets.append(
+                _find_xlsx_row(ws, change["target"].get("row"), code_norm, name_norm)
+            )
+        applied = [False] * len(changes)
+        deletes: set[int] = set()
+        for index, (change, row_index) in enumerate(zip(changes, targets)):
+            if row_index is None or row_index in deletes:
+                continue
+            if change["action"] == "edit":
+                for col, value in enumerate(_change_values(change), start=1):
+                    ws.cell(row_index, col).value = value
+            else:
+                deletes.add(row_index)
+            applied[index] = True
+        for row_index in sorted(deletes, reverse=True):
+            ws.delete_rows(row_index, 1)
+        last_row = 1
+        for r in range(2, ws.max_row + 1):
+            if any(ws.cell(r, c).value not in (None, "") for c in range(1, 5)):
+                last_row = r
+        for index, change in enumerate(changes):
+            if change["action"] != "add":
+                continue
+            last_row += 1
+            for col, value in enumerate(_change_values(change), start=1):
+                ws.cell(last_row, col).value = value
+            applied[index] = True
+        if any(applied):
+            save_workbook_atomic(wb, template_path)
+    finally:
+        wb.close()
+    return applied
+
+
+def _journal_template_changes(
+    template_path: Path, changes: list[dict]
+) -> tuple[list[bool], list[dict]]:
+    # Mirrors _apply_xlsx_changes on the cached rows: edits, then deletes from
+    # the bottom up, then appends after the last remaining occupied row.
+    rows = _load_template_rows(template_path)[1]
+    targets: list[int | None] = []
+    for change in changes:
+        if change["action"] == "add":
+            targets.append(None)
+            continue
+        code_norm, name_norm = _target_keys(change["target"])
+        targets.append(
+            _find_cached_row(rows, change["target"].get("row"), code_norm, name_norm)
+        )
+    applied = [False] * len(changes)
+    entries: list[dict] = []
+    deletes: set[int] = set()
+    for index, (change, row_index) in enumerate(zip(changes, targets)):
+        if row_index is None or row_index in deletes:
+            continue
+        if change["action"] == "edit":
+            entries.append(
+                template_journal.make_entry("edit", row_index, _change_values(change))
+            )
+        else:
+            deletes.add(row_index)
+        applied[index] = True
+    for row_index in sorted(deletes, reverse=True):
+        entries.append(template_journal.make_entry("delete", row_index))
+    last_row = _last_row_after_entries(_journal_last_row(template_path), entries)
+    for index, change in enumerate(changes):
+        if change["action"] != "add":
+            continue
+        last_row += 1
+        entries.append(template_journal.make_entry("add", last_row, _change_values(change)))
+        applied[index] = True
+    return applied, entries
+
+
+def apply_template_changes(
+    changes: list[dict], template_path: Path | None = None
+) -> list[bool]:
+    template_path = resolve_template_path(template_path)
+    if not template_path.exists():
+        raise FileNotFoundError("Template not found.")
+    if not changes:
+        return []
+    with template_lock(template_path).write():
+        return _apply_template_changes(changes, template_path)
+
+
+def _apply_template_changes(changes: list[dict], template_path: Path) -> list[bool]:
+    # Caller holds the template write lock.
+    if _use_template_db():
+        conn = template_db.connect(template_path)
+        resolved = []
+        for change in changes:
+            row_id = None
+            if change["action"] != "add":
+                code_norm, name_norm = _target_keys(change["target"])
+                row_id = template_db.find_row_id(
+                    conn, change["target"].get("row"), code_norm, name_norm
+                )
+            values = _change_values(change) if change["action"] != "delete" else None
+            resolved.append((change["action"], row_id, values))
+        results = template_db.apply_changes(conn, resolved)
+        applied = [result is not None for result in results]
+        if any(applied):
+            bump_version(template_path)
+    elif _use_template_journal():
+        stamp_before = _template_stamp(template_path)
+        last_row = _journal_last_row(template_path)
+        applied, entries = _journal_template_changes(template_path, changes)
+        if entries:
+            template_journal.append_entries(template_path, entries)
+            _record_template_write(
+                template_path,
+                stamp_before,
+                lambda rows: _rows_after_entries(rows, entries),
+            )
+            _TEMPLATE_LAST_ROW[template_path] = (
+                _template_stamp(template_path),
+                _last_row_after_entries(last_row, entries),
+            )
+        return applied
+    else:
+        applied = _apply_xlsx_changes(template_path, changes)
+        if any(applied):
+            bump_version(template_path)
+    _TEMPLATE_ROWS_CACHE.pop(template_path, None)
+    return applied
+
+
+def _same_template_values(row: dict, values: dict) -> bool:
+    new_row = _build_row(
+        row["row"], values["code"], values["name"], values["size"], values["divisor"]
     )
-    target_name_norm = normalize_query(
-        original.get("name_raw", original.get("name_display", ""))
+    return new_row is not None and all(
+        row[key] == new_row[key]
+        for key in ("code_display", "name_display", "size_display", "divisor_display")
     )
-    with TEMPLATE_LOCK:
-        wb = openpyxl.load_workbook(template_path)
-        try:
-            ws = wb.active
-            row_index = None
-            if isinstance(target_row, int) and 2 <= target_row <= ws.max_row:
-                row_code = normalize_code_value(ws.cell(target_row, 1).value)
-                row_name = normalize_query(ws.cell(target_row, 2).value)
-                if row_code == target_code_norm and row_name == target_name_norm:
-                    row_index = target_row
-            if row_index is None:
-                for r in range(2, ws.max_row + 1):
-                    row_code = normalize_code_value(ws.cell(r, 1).value)
-                    row_name = normalize_query(ws.cell(r, 2).value)
-                    if row_code == target_code_norm and row_name == target_name_norm:
-                        row_index = r
-                        break
-            if row_index is None:
-                return False
-            ws.cell(row_index, 1).value = new_values["code"]
-            ws.cell(row_index, 2).value = new_values["name"]
-            ws.cell(row_index, 3).value = new_values["size"]
-            ws.cell(row_index, 4).value = new_values["divisor"]
-            wb.save(template_path)
-            return True
-        finally:
-            wb.close()
 
 
-def get_output_row_details(target: dict, output_path) -> list[tuple[str, str]]:
-    if not output_path.exists():
-        raise FileNotFoundError("Output not found.")
-    target_code_norm = normalize_code_value(
-        target.get("code_raw", target.get("code_display", ""))
+def upsert_template_rows(
+    rows: list[dict], template_path: Path | None = None
+) -> tuple[int, int, int]:
+    template_path = resolve_template_path(template_path)
+    if not template_path.exists():
+        raise FileNotFoundError("Template not found.")
+    incoming: dict[str, dict] = {}
+    for values in rows:
+        incoming[normalize_code_value(values["code"])] = values
+    with template_lock(template_path).write():
+        existing: dict[str, dict] = {}
+        for row in _load_template_rows(template_path)[1]:
+            existing.setdefault(normalize_code_value(row["code_raw"]), row)
+        changes: list[dict] = []
+        unchanged = 0
+        for code_norm, values in incoming.items():
+            target = existing.get(code_norm)
+            if target is None:
+                changes.append({"action": "add", "values": values})
+            elif _same_template_values(target, values):
+                unchanged += 1
+            else:
+                changes.append({"action": "edit", "target": target, "values": values})
+        applied = _apply_template_changes(changes, template_path) if changes else []
+    added = sum(
+        1 for change, ok in zip(changes, applied) if ok and change["action"] == "add"
     )
-    target_name_norm = normalize_query(
-        target.get("name_raw", target.get("name_display", ""))
+    updated = sum(
+        1 for change, ok in zip(changes, applied) if ok and change["action"] == "edit"
+    )
+    return added, updated, unchanged
+
+
+def template_journal_due(template_path: Path | None = None) -> bool:
+    if not _use_template_journal():
+        return False
+    return template_journal.needs_compaction(
+        resolve_template_path(template_path),
+        JOURNAL_COMPACT_BYTES,
+        JOURNAL_QUIET_SECONDS,
     )
+
+
+def compact_template_journal(template_path: Path | None = None) -> bool:
+    template_path = resolve_template_path(template_path)
+    if template_journal.journal_stamp(template_path) is None:
+        return False
+    with template_lock(template_path).write():
+        stamp_before = _template_stamp(template_path)
+        if not template_journal.compact(template_path):
+            return False
+        _record_template_write(template_path, stamp_before, lambda rows: rows)
+    return True
+
+
+def export_template(template_path: Path | None = None) -> Path:
+    template_path = resolve_template_path(template_path)
+    if not _use_template_db():
+        compact_template_journal(template_path)
+        return template_path
+    with template_lock(template_path).write():
+        if template_db.export_xlsx(template_db.connect(template_path), template_path):
+            bump_version(template_path)
+    return template_path
+
+
+def write_output_file(
+    input_path: Path, template_path: Path, output_path: Path, metric: str
+) -> Path:
+    # Runs in a processing worker; the caller exports the template first and
+    # invalidates its own output index afterwards.
+    with file_lock(output_path):
+        # A worker killed mid-save leaves its temporary file behind; no other
+        # save of this output can be running while the lock is held.
+        for stale in output_path.parent.glob(f".{output_path.name}.*.tmp"):
+            stale.unlink(missing_ok=True)
+        process_files(input_path, template_path, output_path, metric, None, False)
+        bump_version(output_path)
+    return output_path
+
+
+def _build_output_index(
+    output_path: Path,
+) -> tuple[dict[tuple[str, str], list[tuple[str, str]]], list[tuple[str, str, list]]]:
+    exact: dict[tuple[str, str], list[tuple[str, str]]] = {}
+    ordered: list[tuple[str, str, list[tuple[str, str]]]] = []
     wb = openpyxl.load_workbook(output_path, data_only=True)
     try:
         ws = wb.active
-        code_col = 1
-        name_col = 2
-        row_index = None
-        for r in range(2, ws.max_row + 1):
-            row_code = normalize_code_value(ws.cell(r, code_col).value)
-            row_name = normalize_query(ws.cell(r, name_col).value)
-            if target_code_norm and row_code != target_code_norm:
-                continue
-            if target_name_norm and row_name != target_name_norm:
-                continue
-            row_index = r
-            break
-        if row_index is None:
-            return []
-        details: list[tuple[str, str]] = []
-        for col in range(1, ws.max_column + 1):
-            header = clean_text(ws.cell(1, col).value)
-            if not header:
-                continue
-            value = ws.cell(row_index, col).value
-            if value in (None, ""):
-                continue
-            details.append((header, str(value)))
-        return details
+        headers = [clean_text(cell.value) for cell in ws[1]]
+        for values in ws.iter_rows(min_row=2, values_only=True):
+            row_code = normalize_code_value(values[0] if values else None)
+            row_name = normalize_query(values[1] if len(values) > 1 else None)
+            details: list[tuple[str, str]] = []
+            for header, value in zip(headers, values):
+                if not header or value in (None, ""):
+                    continue
+                details.append((header, str(value)))
+            ordered.append((row_code, row_name, details))
+            exact.setdefault((row_code, row_name), details)
     finally:
         wb.close()
+    return exact, ordered
+
+
+def _output_index(output_path: Path) -> tuple:
+    if not output_path.exists():
+        raise FileNotFoundError("Output not found.")
+    stamp = (_file_stamp(output_path), read_version(output_path))
+    cached = _OUTPUT_INDEX.get(output_path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, *_build_output_index(output_path))
+        _OUTPUT_INDEX[output_path] = cached
+    return cached
+
+
+def invalidate_output_index(output_path: Path) -> None:
+    _OUTPUT_INDEX.pop(output_path, None)
+
+
+def get_output_rows_details(
+    targets: list[dict], output_path
+) -> list[list[tuple[str, str]]]:
+    _, exact, ordered = _output_index(output_path)
+    results: list[list[tuple[str, str]]] = []
+    for target in targets:
+        code_norm, name_norm = _target_keys(target)
+        if code_norm and name_norm:
+            details = exact.get((code_norm, name_norm), [])
+        else:
+            details = next(
+                (
+                    row_details
+                    for row_code, row_name, row_details in ordered
+                    if (not code_norm or row_code == code_norm)
+                    and (not name_norm or row_name == name_norm)
+                ),
+                [],
+            )
+        results.append(list(details))
+    return results
+
+
+def get_output_row_details(target: dict, output_path) -> list[tuple[str, str]]:
+    return get_output_rows_details([target], output_path)[0]
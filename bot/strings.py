@@ -6,6 +6,8 @@ MANAGE_MENU_TEXT = "تنظیمات"
 DETAILS_TEXT = "جزئیات طرح"
 DETAILS_ALL_TEXT = "خروجی همه طرح‌ها"
 DETAILS_FILTERED_TEXT = "خروجی موارد فیلتر شده"
+DETAILS_ALL_PDF_TEXT = "فقط PDF همه طرح‌ها"
+DETAILS_FILTERED_PDF_TEXT = "فقط PDF موارد فیلتر شده"
 PRODUCTS_MENU_TEXT = "فایل محصولات"
 PRODUCTS_UPLOAD_TEXT = "ارسال فایل محصولات"
 PRODUCTS_DOWNLOAD_TEXT = "دریافت فایل مرتب شده"
@@ -13,6 +15,11 @@ PRODUCTS_DOWNLOAD_TEXT = "دریافت فایل مرتب شده"
 ADD_ROW_TEXT = "اضافه کردن طرح"
 EDIT_ROW_TEXT = "ویرایش طرح"
 DELETE_ROW_TEXT = "حذف طرح"
+STAGE_CHANGE_TEXT = "افزودن به لیست تغییرات"
+REVIEW_CHANGES_TEXT = "بازبینی تغییرات"
+COMMIT_CHANGES_TEXT = "ثبت تغییرات"
+DISCARD_CHANGES_TEXT = "حذف لیست تغییرات"
+IMPORT_ROWS_TEXT = "ورود گروهی طرح‌ها"
 
 BACK_TEXT = "برگشت"
 CONFIRM_TEXT = "تایید"
@@ -0,0 +1,237 @@
+import json
+import sqlite3
+from decimal import Decimal
+from pathlib import Path
+
+import openpyxl
+
+from build_output import save_workbook_atomic
+
+from .utils import normalize_code_value, normalize_query
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS rows (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        code,
+        name,
+        size,
+        divisor,
+        code_norm TEXT NOT NULL,
+        name_norm TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS rows_code_norm ON rows (code_norm)",
+    "CREATE INDEX IF NOT EXISTS rows_name_norm ON rows (name_norm)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+_CONNECTIONS: dict[Path, sqlite3.Connection] = {}
+
+
+def template_db_path(template_path: Path) -> Path:
+    return template_path.with_suffix(".sqlite3")
+
+
+def _sql_value(value):
+    if isinstance(value, Decimal):
+        if value == value.to_integral_value():
+            return int(value)
+        return float(value)
+    return value
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> str | None:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: object) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+    )
+
+
+def _bump_version(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'"
+    )
+
+
+def _import_xlsx(conn: sqlite3.Connection, template_path: Path) -> None:
+    wb = openpyxl.load_workbook(template_path)
+    try:
+        ws = wb.active
+        header = [cell.value for cell in ws[1]][:4]
+        rows = [
+            values
+            for values in ws.iter_rows(min_row=2, max_col=4, values_only=True)
+            if any(value not in (None, "") for value in values)
+        ]
+    finally:
+        wb.close()
+    conn.executemany(
+        "INSERT INTO rows (code, name, size, divisor, code_norm, name_norm)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (
+                _sql_value(code),
+                _sql_value(name),
+                _sql_value(size),
+                _sql_value(divisor),
+                normalize_code_value(code),
+                normalize_query(name),
+            )
+            for code, name, size, divisor in rows
+        ],
+    )
+    _set_meta(conn, "header", json.dumps(header, ensure_ascii=False))
+    _set_meta(conn, "version", 1)
+    _set_meta(conn, "exported_version", 1)
+
+
+def connect(template_path: Path) -> sqlite3.Connection:
+    db_path = template_db_path(template_path)
+    conn = _CONNECTIONS.get(db_path)
+    if conn is not None:
+        return conn
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    with conn:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        if _get_meta(conn, "version") is None:
+            _import_xlsx(conn, template_path)
+    _CONNECTIONS[db_path] = conn
+    return conn
+
+
+def db_version(conn: sqlite3.Connection) -> int:
+    return int(_get_meta(conn, "version") or 0)
+
+
+def fetch_rows(conn: sqlite3.Connection) -> list[tuple]:
+    return conn.execute(
+        "SELECT id, code, name, size, divisor FROM rows ORDER BY id"
+    ).fetchall()
+
+
+def find_row_id(
+    conn: sqlite3.Connection, row_id, code_norm: str, name_norm: str
+) -> int | None:
+    if isinstance(row_id, int):
+        found = conn.execute(
+            "SELECT id FROM rows WHERE id = ? AND code_norm = ? AND name_norm = ?",
+            (row_id, code_norm, name_norm),
+        ).fetchone()
+        if found:
+            return found[0]
+    found = conn.execute(
+        "SELECT id FROM rows WHERE code_norm = ? AND name_norm = ? ORDER BY id LIMIT 1",
+        (code_norm, name_norm),
+    ).fetchone()
+    return found[0] if found else None
+
+
+def insert_row(conn: sqlite3.Connection, code, name, size, divisor) -> int:
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO rows (code, name, size, divisor, code_norm, name_norm)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                _sql_value(code),
+                _sql_value(name),
+                _sql_value(size),
+                _sql_value(divisor),
+                normalize_code_value(code),
+                normalize_query(name),
+            ),
+        )
+        _bump_version(conn)
+    return cursor.lastrowid
+
+
+def update_row(conn: sqlite3.Connection, row_id: int, code, name, size, divisor) -> None:
+    with conn:
+        conn.execute(
+            "UPDATE rows SET code = ?, name = ?, size = ?, divisor = ?,"
+            " code_norm = ?, name_norm = ? WHERE id = ?",
+            (
+                _sql_value(code),
+                _sql_value(name),
+                _sql_value(size),
+                _sql_value(divisor),
+                normalize_code_value(code),
+                normalize_query(name),
+                row_id,
+            ),
+        )
+        _bump_version(conn)
+
+
+def delete_row(conn: sqlite3.Connection, row_id: int) -> None:
+    with conn:
+        conn.execute("DELETE FROM rows WHERE id = ?", (row_id,))
+        _bump_version(conn)
+
+
+def apply_changes(conn: sqlite3.Connection, changes: list[tuple]) -> list[int | None]:
+    results: list[int | None] = []
+    with conn:
+        for action, row_id, values in changes:
+            if action == "add":
+                cursor = conn.execute(
+                    "INSERT INTO rows (code, name, size, divisor, code_norm, name_norm)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        *(_sql_value(value) for value in values),
+                        normalize_code_value(values[0]),
+                        normalize_query(values[1]),
+                    ),
+                )
+                results.append(cursor.lastrowid)
+            elif row_id is None:
+                results.append(None)
+            elif action == "edit":
+                cursor = conn.execute(
+                    "UPDATE rows SET code = ?, name = ?, size = ?, divisor = ?,"
+                    " code_norm = ?, name_norm = ? WHERE id = ?",
+                    (
+                        *(_sql_value(value) for value in values),
+                        normalize_code_value(values[0]),
+                        normalize_query(values[1]),
+                        row_id,
+                    ),
+                )
+                results.append(row_id if cursor.rowcount else None)
+            else:
+                cursor = conn.execute("DELETE FROM rows WHERE id = ?", (row_id,))
+                results.append(row_id if cursor.rowcount else None)
+        _bump_version(conn)
+    return results
+
+
+def export_xlsx(conn: sqlite3.Connection, template_path: Path) -> bool:
+    version = db_version(conn)
+    if int(_get_meta(conn, "exported_version") or 0) == version:
+        return False
+    header = json.loads(_get_meta(conn, "header") or "[]")
+    if template_path.exists():
+        wb = openpyxl.load_workbook(template_path)
+    else:
+        wb = openpyxl.Workbook()
+    try:
+        ws = wb.active
+        if ws.max_row > 1:
+            ws.delete_rows(2, ws.max_row - 1)
+        for col, value in enumerate(header, start=1):
+            ws.cell(1, col).value = value
+        for r, values in enumerate(fetch_rows(conn), start=2):
+            for col, value in enumerate(values[1:], start=1):
+                ws.cell(r, col).value = value
+        save_workbook_atomic(wb, template_path)
+    finally:
+        wb.close()
+    with conn:
+        _set_meta(conn, "exported_version", version)
+    return True
@@ -0,0 +1,69 @@
+import csv
+from decimal import Decimal, InvalidOperation
+from io import BytesIO, StringIO
+
+import openpyxl
+
+from .utils import clean_text, normalize_code_value, normalize_digits
+
+
+def _parse_divisor(value) -> Decimal | None:
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    text = normalize_digits(clean_text(value)).replace(",", ".")
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def _xlsx_rows(data: bytes) -> list[tuple]:
+    wb = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        return list(wb.active.iter_rows(max_col=4, values_only=True))
+    finally:
+        wb.close()
+
+
+def _csv_rows(data: bytes) -> list[tuple]:
+    text = data.decode("utf-8-sig")
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    return [tuple(values[:4]) for values in csv.reader(StringIO(text), dialect)]
+
+
+def read_import_rows(data: bytes, filename: str) -> tuple[list[dict], list[str]]:
+    if filename.lower().endswith(".csv"):
+        raw_rows = _csv_rows(data)
+    else:
+        raw_rows = _xlsx_rows(data)
+    rows: list[dict] = []
+    errors: list[str] = []
+    for line, values in enumerate(raw_rows, start=1):
+        values = tuple(values) + (None,) * (4 - len(values))
+        code_raw, name_raw, size_raw, divisor_raw = values
+        if all(clean_text(value) == "" for value in values):
+            continue
+        divisor = _parse_divisor(divisor_raw)
+        if line == 1 and divisor is None:
+            continue
+        code = normalize_code_value(code_raw)
+        name = clean_text(name_raw)
+        if not code:
+            errors.append(f"ردیف {line}: کد کالا خالی است.")
+        elif not name:
+            errors.append(f"ردیف {line}: نام طرح خالی است.")
+        elif divisor is None:
+            errors.append(f"ردیف {line}: مقدار تقسیم پالت عدد معتبر نیست.")
+        else:
+            rows.append(
+                {
+                    "code": code,
+                    "name": name,
+                    "size": clean_text(size_raw),
+                    "divisor": divisor,
+                }
+            )
+    return rows, errors
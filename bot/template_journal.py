@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+import openpyxl
+
+from build_output import save_workbook_atomic
+
+_IDENTIFIER_PREFIX = "journal:"
+
+
+def journal_path(template_path: Path) -> Path:
+    return template_path.with_suffix(".journal")
+
+
+def journal_stamp(template_path: Path) -> tuple[int, int] | None:
+    try:
+        stat = journal_path(template_path).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        if value == value.to_integral_value():
+            return int(value)
+        return float(value)
+    return value
+
+
+def make_entry(action: str, row_index: int, values=None) -> dict:
+    entry = {"action": action, "row": row_index}
+    if values is not None:
+        entry["values"] = [_json_value(value) for value in values]
+    return entry
+
+
+def append_entries(template_path: Path, entries: list[dict]) -> None:
+    path = journal_path(template_path)
+    lines = [json.dumps(entry, ensure_ascii=False) for entry in entries]
+    with open(path, "ab+") as handle:
+        if handle.tell() == 0:
+            lines.insert(0, json.dumps({"generation": uuid.uuid4().hex}))
+        else:
+            handle.seek(-1, os.SEEK_END)
+            if handle.read(1) != b"\n":
+                # A torn line from an interrupted append must not swallow ours.
+                handle.write(b"\n")
+        handle.write(("\n".join(lines) + "\n").encode("utf-8"))
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def read_journal(template_path: Path) -> tuple[str | None, list[dict]]:
+    path = journal_path(template_path)
+    try:
+        text = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None, []
+    generation = None
+    entries: list[dict] = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            logging.warning("Skipping unreadable journal line in %s", path)
+            continue
+        if "generation" in record:
+            generation = record["generation"]
+        else:
+            entries.append(record)
+    return generation, entries
+
+
+def _compacted_count(identifier: str | None, generation: str | None) -> int:
+    # The workbook records which journal generation it already absorbed, so a
+    # crash between saving the workbook and removing the journal is harmless.
+    if not identifier or not generation:
+        return 0
+    prefix = f"{_IDENTIFIER_PREFIX}{generation}:"
+    if not identifier.startswith(prefix):
+        return 0
+    return int(identifier[len(prefix):])
+
+
+def pending_entries(template_path: Path, identifier: str | None) -> list[dict]:
+    generation, entries = read_journal(template_path)
+    return entries[_compacted_count(identifier, generation):]
+
+
+def apply_entry_to_sheet(ws, entry: dict) -> None:
+    row_index = entry["row"]
+    if entry["action"] == "delete":
+        ws.delete_rows(row_index, 1)
+        return
+    for col, value in enumerate(entry["values"], start=1):
+        ws.cell(row_index, col).value = value
+
+
+def compact(template_path: Path) -> bool:
+    generation, entries = read_journal(template_path)
+    if generation is None and not entries:
+        return False
+    wb = openpyxl.load_workbook(template_path)
+    try:
+        skip = _compacted_count(wb.properties.identifier, generation)
+        if entries[skip:]:
+            ws = wb.active
+            for entry in entries[skip:]:
+                apply_entry_to_sheet(ws, entry)
+            wb.properties.identifier = (
+                f"{_IDENTIFIER_PREFIX}{generation}:{len(entries)}"
+            )
+            save_workbook_atomic(wb, template_path)
+    finally:
+        wb.close()
+    journal_path(template_path).unlink()
+    return True
+
+
+def needs_compaction(template_path: Path, max_bytes: int, quiet_seconds: float) -> bool:
+    try:
+        stat = journal_path(template_path).stat()
+    except FileNotFoundError:
+        return False
+    if stat.st_size >= max_bytes:
+        return True
+    return time.time() - stat.st_mtime >= quiet_seconds
@@ -1,4 +1,6 @@
-from telegram import Update
+from telegram import Bot, Update
+
+from .outbound import BULK, deliver
 
 RLM = "\u200f"
 
@@ -16,4 +18,16 @@ async def send_text(update: Update | None, text: str, **kwargs) -> None:
         message = update.message or update.effective_message
     if not message:
         return
-    await message.reply_text(rtl(text), **kwargs)
+    await deliver(message.chat_id, lambda: message.reply_text(rtl(text), **kwargs))
+
+
+async def send_chat_text(bot: Bot, chat_id: int, text: str, **kwargs) -> None:
+    await deliver(chat_id, lambda: bot.send_message(chat_id, rtl(text), **kwargs))
+
+
+async def send_bulk_texts(bot: Bot, chat_id: int, texts: list[str], **kwargs) -> None:
+    # One at a time, so a retried message cannot be overtaken by the next.
+    for text in texts:
+        await deliver(
+            chat_id, lambda text=text: bot.send_message(chat_id, rtl(text), **kwargs), BULK
+        )
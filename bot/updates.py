@@ -0,0 +1,55 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# PTB's own semaphore would also count updates that are only waiting for an
+# earlier update from the same user, so one busy user could fill every slot.
+# It is left effectively unbounded and the cap is applied once an update's
+# turn has come.
+_UNBOUNDED = 2**31
+
+
+def _order_key(update: object) -> int | None:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    # Handles updates from different users concurrently, up to max_running
+    # handlers at once, while each user's updates run one after another in
+    # arrival order, so conversation state and user_data flags never race.
+
+    def __init__(self, max_running: int) -> None:
+        super().__init__(_UNBOUNDED)
+        self._slots = asyncio.BoundedSemaphore(max(1, max_running))
+        self._tails: dict[int, asyncio.Future] = {}
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        # Runs without yielding up to the wait below, so updates join their
+        # user's chain in the order the application fetched them.
+        key = _order_key(update)
+        previous = self._tails.get(key) if key is not None else None
+        done = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._tails[key] = done
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+            async with self._slots:
+                await coroutine
+        finally:
+            done.set_result(None)
+            if key is not None and self._tails.get(key) is done:
+                del self._tails[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
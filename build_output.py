@@ -1,8 +1,12 @@
 import argparse
+import os
 import re
+import uuid
 from collections import Counter
 from decimal import Decimal, ROUND_HALF_UP
+from io import BytesIO
 from pathlib import Path
+from typing import BinaryIO
 
 import openpyxl
 import pdfplumber
@@ -281,7 +285,7 @@ def build_input_row(
 
 
 def load_input_rows_xlsx(
-    input_path: Path, sheet: str | None
+    input_path: Path | BinaryIO, sheet: str | None
 ) -> list[dict]:
     in_wb = openpyxl.load_workbook(input_path, data_only=True)
     try:
@@ -317,7 +321,7 @@ def load_input_rows_xlsx(
     return input_rows
 
 
-def load_input_rows_pdf(input_path: Path) -> list[dict]:
+def load_input_rows_pdf(input_path: Path | BinaryIO) -> list[dict]:
     input_rows: list[dict] = []
     with pdfplumber.open(input_path) as pdf:
         for page in pdf.pages:
@@ -485,25 +489,24 @@ def parse_args() -> argparse.Namespace:
     return p.parse_args()
 
 
-def process_files(
-    input_path: str | Path,
+def save_workbook_atomic(wb, path: str | Path) -> None:
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        wb.save(tmp_path)
+        with open(tmp_path, "rb+") as handle:
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def fill_template(
+    input_rows: list[dict],
     template_path: str | Path,
-    output_path: str | Path,
     metric: str = "physical",
     sheet: str | None = None,
-    in_place: bool = False,
-) -> Path:
-    if metric not in METRIC_INPUT_INDEX:
-        raise ValueError(f"Unsupported metric: {metric}")
-    input_path = Path(input_path)
-    template_path = Path(template_path)
-    output_path = template_path if in_place else Path(output_path)
-
-    if input_path.suffix.lower() == ".pdf":
-        input_rows = load_input_rows_pdf(input_path)
-    else:
-        input_rows = load_input_rows_xlsx(input_path, sheet)
-
+):
     out_wb = openpyxl.load_workbook(template_path)
     try:
         out_ws = out_wb[sheet] if sheet else out_wb.active
@@ -591,13 +594,62 @@ def process_files(
                     tonality_cols.get(tonality_key) if tonality_key else None,
                     divisor,
                 )
+    except BaseException:
+        out_wb.close()
+        raise
+    return out_wb
+
+
+def process_files(
+    input_path: str | Path,
+    template_path: str | Path,
+    output_path: str | Path,
+    metric: str = "physical",
+    sheet: str | None = None,
+    in_place: bool = False,
+) -> Path:
+    if metric not in METRIC_INPUT_INDEX:
+        raise ValueError(f"Unsupported metric: {metric}")
+    input_path = Path(input_path)
+    template_path = Path(template_path)
+    output_path = template_path if in_place else Path(output_path)
+
+    if input_path.suffix.lower() == ".pdf":
+        input_rows = load_input_rows_pdf(input_path)
+    else:
+        input_rows = load_input_rows_xlsx(input_path, sheet)
 
-        out_wb.save(output_path)
+    out_wb = fill_template(input_rows, template_path, metric, sheet)
+    try:
+        save_workbook_atomic(out_wb, output_path)
     finally:
         out_wb.close()
     return output_path
 
 
+def process_bytes(
+    input_data: bytes,
+    input_name: str,
+    template_path: str | Path,
+    metric: str = "physical",
+    sheet: str | None = None,
+) -> bytes:
+    if metric not in METRIC_INPUT_INDEX:
+        raise ValueError(f"Unsupported metric: {metric}")
+    if input_name.lower().endswith(".pdf"):
+        input_rows = load_input_rows_pdf(BytesIO(input_data))
+    else:
+        input_rows = load_input_rows_xlsx(BytesIO(input_data), sheet)
+
+    out_wb = fill_template(input_rows, template_path, metric, sheet)
+    try:
+        buffer = BytesIO()
+        out_wb.save(buffer)
+    finally:
+        out_wb.close()
+    return buffer.getvalue()
+
+
 def main() -> int:
     args = parse_args()
     output_path = process_files(
@@ -0,0 +1,26 @@
+import openpyxl
+
+from bot import storage
+
+
+def _write_template(path, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["کد", "نام", "سایز", "تقسیم"])
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def test_journal_append_skips_row_without_code_and_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "TEMPLATE_BACKEND", "xlsx")
+    monkeypatch.setattr(storage, "TEMPLATE_JOURNAL", True)
+    template_path = tmp_path / "template.xlsx"
+    _write_template(template_path, [["A1", "alpha", 10, 2], [None, None, 5, 3]])
+
+    assert storage.append_template_row("B2", "beta", "20", 4, template_path) == 4
+    assert storage.compact_template_journal(template_path)
+
+    ws = openpyxl.load_workbook(template_path).active
+    assert [ws.cell(3, col).value for col in range(1, 5)] == [None, None, 5, 3]
+    assert [ws.cell(4, col).value for col in range(1, 3)] == ["B2", "beta"]